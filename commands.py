@@ -67,9 +67,10 @@ class SublimelinterLintCommand(sublime_plugin.TextCommand):
         return vid in persist.view_linters and persist.settings.get('lint_mode') != 'background'
 
     def run(self, edit):
-        """Lint the current view."""
+        """Lint the current view as soon as possible, with the priority of a save."""
         from .sublimelinter import SublimeLinter
-        SublimeLinter.shared_plugin().lint(self.view.id())
+        from .lint.queue import PRIORITY_SAVE
+        SublimeLinter.shared_plugin().hit(self.view, delay=0, priority=PRIORITY_SAVE)
 
 
 class HasErrorsCommand:
@@ -820,3 +821,54 @@ class SublimelinterReportCommand(sublime_plugin.WindowCommand):
 
         from .sublimelinter import SublimeLinter
         Thread(target=SublimeLinter.lint, args=args).start()
+
+
+class SublimelinterShowStatusCommand(sublime_plugin.WindowCommand):
+
+    """
+    A command that displays the state of the lint machinery in a quick panel.
+
+    Each linter is listed with the state of its circuit breaker and the number
+    of each kind of failure since it was loaded, followed by the lint queue
+    and the process admission controller.
+
+    """
+
+    def run(self):
+        """Run the command."""
+
+        from .lint.queue import queue
+        items = []
+
+        for name, linter_class in sorted(persist.linter_classes.items()):
+            state = linter_class.breaker.state()
+
+            if state['state'] == 'open':
+                detail = 'skipped for {:.0f}s after {} failures, last failure: {}'.format(
+                    state['remaining'], state['failures'], state['reason']
+                )
+            elif state['failures']:
+                detail = '{} failures in a row, last failure: {}'.format(state['failures'], state['reason'])
+            else:
+                detail = 'no recent failures'
+
+            if state['totals']:
+                detail += '; total: ' + ', '.join(
+                    '{} {}x'.format(reason, count) for reason, count in sorted(state['totals'].items())
+                )
+
+            items.append(['{}: {}'.format(name, state['state']), detail])
+
+        metrics = queue.metrics()
+        items.append([
+            'lint queue',
+            '{pending} pending, {ready} ready, {running} running, peak depth {peak_depth}'.format(**metrics)
+        ])
+
+        metrics = util.admission.metrics()
+        items.append([
+            'processes',
+            '{running} running, {waiting} waiting, longest wait {max_wait:.2f}s'.format(**metrics)
+        ])
+
+        self.window.show_quick_panel(items, lambda index: None)
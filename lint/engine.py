@@ -0,0 +1,144 @@
+#
+# engine.py
+# Part of SublimeLinter3, a code checking framework for Sublime Text 3
+#
+# Written by Ryan Hileman and Aparajita Fishman
+#
+# Project: https://github.com/SublimeLinter/SublimeLinter3
+# License: MIT
+#
+
+"""
+This module provides an asyncio-based engine for running linter processes.
+
+The engine runs a single asyncio event loop on a background thread, and
+all linter processes are driven by that loop. Writing to stdin and reading
+from stdout and stderr never blocks a thread per process, so many concurrent
+lints cost one thread instead of one per process.
+
+The engine requires python 3.8 or later, which is the first version
+whose asyncio can run subprocesses from an event loop outside the main thread.
+It is used by util.execute when the "subprocess_engine" setting is "asyncio".
+
+"""
+
+import asyncio
+import subprocess
+import sys
+import threading
+
+from . import persist, util
+
+
+class AsyncioEngine:
+
+    """An engine that runs processes on an asyncio event loop in a background thread."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run_loop, daemon=True)
+        self.thread.start()
+
+    def run_loop(self):
+        """Run the event loop forever. This is the target of the engine's thread."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def execute(self, cmd, code=None, cwd=None, token=None, timeout=None, limits=None):
+        """
+        Run cmd on the event loop and wait for its output.
+
+        The arguments, return value and exceptions are the same as util.run_process.
+
+        """
+
+        future = asyncio.run_coroutine_threadsafe(
+            self.communicate(cmd, code, cwd, token, timeout, limits),
+            self.loop
+        )
+
+        return future.result()
+
+    async def communicate(self, cmd, code, cwd, token, timeout, limits):
+        """Start cmd, send it code, and return its stdout and stderr as bytes."""
+
+        options = util.popen_options()
+
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *util.limit_cmd(cmd, limits), stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                cwd=cwd, **options)
+        except OSError as err:
+            util.popen_failed(cmd, err, options['env'])
+            raise util.ProcessSpawnError(cmd)
+
+        if token is not None:
+            token.register(proc)
+
+        try:
+            out = await self.wait_process(proc, code, token, timeout)
+        finally:
+            if token is not None:
+                token.unregister(proc)
+
+        if out is None:
+            raise util.ProcessTimeout(cmd, timeout)
+
+        util.check_limits(cmd, proc.returncode, limits, token)
+        return out
+
+    async def wait_process(self, proc, code, token, timeout):
+        """Send code to proc and return its output, as described in util.wait_process."""
+
+        task = asyncio.ensure_future(proc.communicate(code))
+        deadline = None if timeout is None else self.loop.time() + timeout
+
+        while True:
+            wait = util.KILL_POLL
+
+            if deadline is not None:
+                wait = max(0, min(wait, deadline - self.loop.time()))
+
+            done, pending = await asyncio.wait({task}, timeout=wait)
+
+            if done:
+                return task.result()
+
+            if token is not None and token.cancelled:
+                out = b'', b''
+            elif deadline is not None and self.loop.time() >= deadline:
+                out = None
+            else:
+                continue
+
+            # Processes that escaped the kill may keep the pipes open
+            util.kill_process(proc)
+            task.cancel()
+
+            try:
+                await asyncio.wait_for(proc.wait(), util.KILL_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+
+            return out
+
+
+engine = None
+lock = threading.Lock()
+
+
+def get_engine():
+    """Return the shared engine, starting it if necessary, or None if it is not supported."""
+
+    global engine
+
+    if sys.version_info < (3, 8):
+        persist.debug('the asyncio subprocess engine requires python 3.8 or later')
+        return None
+
+    with lock:
+        if engine is None:
+            engine = AsyncioEngine()
+
+    return engine
@@ -17,22 +17,52 @@ PythonLinter    Linter subclass that provides base python configuration.
 
 """
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from fnmatch import fnmatch
 from functools import lru_cache
+import json
+from multiprocessing import cpu_count
 from numbers import Number
 import os
 import re
 import shlex
 import sublime
+import threading
+import time
 import traceback
 
-from . import highlight, persist, util
+from . import highlight, persist, server, util
+from .queue import queue
 
 #
 # Private constants
 #
 ARG_RE = re.compile(r'(?P<prefix>--?)?(?P<name>[@\w][\w\-]*)(?:(?P<joiner>[=:])(?:(?P<sep>.)(?P<multiple>\+)?)?)?')
 BASE_CLASSES = ('PythonLinter',)
+COST_CLASSES = ('low', 'medium', 'high')
+CAPABILITIES = ('parallel_safe', 'multiple_files', 'server_mode', 'line_local')
+PYTHON_WORKER = os.path.join(os.path.dirname(__file__), 'python_worker.py')
+
+# The number of recent latencies kept per file size bucket, and the number
+# needed before a linter can be moved out of or back into background mode.
+LATENCY_SAMPLES = 20
+MIN_LATENCY_SAMPLES = 10
+
+# A slow linter is moved back into background mode when its 90th percentile
+# latency drops below this fraction of the budget.
+LATENCY_RECOVERY = 0.8
+
+# The longest a batch of files may run, see Linter.lint_batch
+BATCH_TIMEOUT = 30
+
+# The keys returned by Linter.get_limits and the settings they come from
+LIMIT_SETTINGS = (
+    ('memory', 'memory_limit'),
+    ('cpu_time', 'cpu_time_limit'),
+    ('nice', 'nice'),
+    ('io_priority', 'io_priority'),
+)
 
 
 class Registrar(type):
@@ -51,16 +81,18 @@ class Registrar(type):
         - Add a leading dot to the tempfile_suffix if necessary.
         - Build a map between defaults and linter arguments.
         - Add '@python' as an inline setting to PythonLinter subclasses.
+        - Validate the cost and capability attributes.
 
         Finally, the class is registered as a linter for its configured syntax.
 
         """
 
         if bases:
-            cmd = attrs.get('cmd')
+            for attr in ('cmd', 'server_cmd'):
+                cmd = attrs.get(attr)
 
-            if isinstance(cmd, str):
-                setattr(self, 'cmd', shlex.split(cmd))
+                if isinstance(cmd, str):
+                    setattr(self, attr, shlex.split(cmd))
 
             if 'word_re' in attrs and isinstance(attrs['word_re'], str):
                 setattr(self, 'word_re', re.compile(self.word_re))
@@ -77,6 +109,14 @@ class Registrar(type):
             if 'defaults' in attrs and attrs['defaults']:
                 self.map_args(attrs['defaults'])
 
+            # Each linter class keeps its own latency history, circuit breaker and run lock
+            setattr(self, 'latencies', {})
+            setattr(self, 'slow_buckets', set())
+            setattr(self, 'breaker', util.CircuitBreaker())
+            setattr(self, 'run_lock', threading.Lock())
+
+            self.validate_capabilities(name.lower())
+
             if 'PythonLinter' in [base.__name__ for base in bases]:
                 # Set attributes necessary for the @python inline setting
                 inline_settings = list(getattr(self, 'inline_settings') or [])
@@ -85,6 +125,27 @@ class Registrar(type):
             if 'syntax' in attrs and name not in BASE_CLASSES:
                 persist.register_linter(self, name, attrs)
 
+    def validate_capabilities(self, name):
+        """Reset invalid cost and capability attributes to their defaults and report them."""
+
+        if self.cost not in COST_CLASSES:
+            persist.printf(
+                '{}: cost must be one of {}, not {!r}, using \'medium\''
+                .format(name, ', '.join(COST_CLASSES), self.cost)
+            )
+            setattr(self, 'cost', 'medium')
+
+        for attr in CAPABILITIES:
+            value = getattr(self, attr)
+
+            if not isinstance(value, bool):
+                persist.printf('{}: {} must be True or False, not {!r}'.format(name, attr, value))
+                setattr(self, attr, bool(value))
+
+        if self.server_mode and not self.server_cmd:
+            persist.printf('{}: server_mode requires server_cmd, running without a server'.format(name))
+            setattr(self, 'server_mode', False)
+
     def map_args(self, defaults):
         """
         Map plain setting names to args that will be passed to the linter executable.
@@ -248,6 +309,36 @@ class Linter(metaclass=Registrar):
     # inline setting, or None if there is no match.
     shebang_match = None
 
+    # The following attributes describe the linter to the scheduler.
+    #
+    # cost is how long the linter usually takes: 'low', 'medium' or 'high'.
+    # It is used to estimate the cost of lints that have no history yet,
+    # and the delay before a background lint is longer for costly linters.
+    cost = 'medium'
+
+    # Set to False if only one instance of the linter can run at a time,
+    # e.g. because it writes to a shared cache.
+    parallel_safe = True
+
+    # Set to True if the linter's executable accepts several files per invocation.
+    # When all views are relinted, the linter is then run once per group of views
+    # with the same command line, with the paths of temporary copies of the views
+    # appended to the command line, and its output is split by path (see lint_batches).
+    multiple_files = False
+
+    # Set to True if the linter's executable can run as a persistent server,
+    # see server.py. server_cmd is then the command line that starts the
+    # server, in the same form as cmd. Its first element is located like
+    # the executable of cmd, and no arguments are added to it.
+    server_mode = False
+    server_cmd = None
+
+    # Set to True if the linter's errors on a line only depend on that line.
+    # Linting in the middle of an edit then cannot report errors on the
+    # other lines, so the delay before a background lint is shorter
+    # when all of a view's linters are line local.
+    line_local = False
+
     #
     # Internal class storage, do not set
     #
@@ -255,6 +346,14 @@ class Linter(metaclass=Registrar):
     errors = None
     highlight = None
     lint_settings = None
+    executor = None
+    token = None
+    latencies = None
+    slow_buckets = None
+    breaker = None
+    run_lock = None
+    batch_output = None
+    run_time = 0
 
     def __init__(self, view, syntax, filename=None):
         self.view = view
@@ -603,7 +702,7 @@ class Linter(metaclass=Registrar):
         ]
 
     @classmethod
-    def lint_view(cls, vid, filename, code, sections, hit_time, callback):
+    def lint_view(cls, vid, filename, code, sections, hit_time, callback, token=None, background=False):
         """
         Lint the view with the given view id.
 
@@ -612,7 +711,11 @@ class Linter(metaclass=Registrar):
         assigned to the view:
 
         - Check if the linter has been disabled in settings.
+        - If background is True, check if the linter is too slow to run in
+          background mode on code of this size. If so, it is not run, but
+          its results from the last lint are kept.
         - Check if the filename matches any patterns in the "excludes" setting.
+        - Check if the linter's circuit breaker is open because it keeps failing.
 
         If a linter fails the checks, it is disabled for this run.
         Otherwise, if the mapped syntax is not in the linter's selectors,
@@ -622,7 +725,14 @@ class Linter(metaclass=Registrar):
         aggregated, and for each selector, if it occurs in sections,
         the corresponding section is linted as embedded code.
 
-        A list of the linters that ran is returned.
+        The linters run concurrently. Once they have all finished,
+        callback is called with the list of linters that ran or were
+        skipped as too slow.
+
+        If token is not None, it is a util.CancelToken that is used to
+        abort the lint. If the token is cancelled, callback is not called.
+
+        True is returned if callback was called.
 
         """
 
@@ -635,9 +745,13 @@ class Linter(metaclass=Registrar):
             return
 
         disabled = set()
+        skipped = set()
+        tasks = []
         syntax = persist.get_syntax(persist.views[vid])
 
         for linter in linters:
+            linter.token = token
+
             # Because get_view_settings is expensive, we use an lru_cache
             # to cache its results. Before each lint, reset the cache.
             linter.get_view_settings.cache_clear()
@@ -647,58 +761,202 @@ class Linter(metaclass=Registrar):
                 disabled.add(linter)
                 continue
 
+            if background and linter.is_slow(len(code)):
+                persist.debug('{} skipped in background mode, too slow'.format(linter.name))
+                skipped.add(linter)
+                continue
+
             if filename:
                 filename = os.path.realpath(filename)
-                excludes = util.convert_type(view_settings.get('excludes', []), [])
-
-                if excludes:
-                    matched = False
-
-                    for pattern in excludes:
-                        if fnmatch(filename, pattern):
-                            persist.debug(
-                                '{} skipped \'{}\', excluded by \'{}\''
-                                .format(linter.name, filename, pattern)
-                            )
-                            matched = True
-                            break
 
-                    if matched:
-                        disabled.add(linter)
-                        continue
+                if linter.is_excluded(filename, view_settings):
+                    disabled.add(linter)
+                    continue
+
+            if not linter.breaker.allow():
+                persist.debug('{} skipped, it keeps failing'.format(linter.name))
+                disabled.add(linter)
+                continue
 
             if syntax not in linter.selectors:
-                linter.reset(code, filename=filename or 'untitled')
-                linter.lint()
+                tasks.append((linter.lint_code, (code, filename)))
 
         selectors = Linter.get_selectors(vid, syntax=syntax)
 
         for sel, linter in selectors:
-            if linter in disabled:
+            if linter in disabled or linter in skipped:
                 continue
 
             linters.add(linter)
 
             if sel in sections:
-                linter.reset(code, filename=filename or 'untitled')
-                errors = {}
-
-                for line_offset, start, end in sections[sel]:
-                    linter.highlight.move_to(line_offset, start)
-                    linter.code = code[start:end]
-                    linter.errors = {}
-                    linter.lint()
+                tasks.append((linter.lint_sections, (code, filename, sections[sel])))
 
-                    for line, line_errors in linter.errors.items():
-                        errors[line + line_offset] = line_errors
+        cls.run_tasks(tasks)
 
-                linter.errors = errors
+        if token is not None and token.cancelled:
+            return
 
         # Remove disabled linters
         linters = list(linters - disabled)
 
         # Merge our result back to the main thread
         callback(cls.get_view(vid), linters, hit_time)
+        return True
+
+    @classmethod
+    def run_tasks(cls, tasks):
+        """
+        Run a list of (callable, args) tasks concurrently and wait for them to finish.
+
+        Each task runs on a thread from a shared pool. If any task raises
+        an exception, it is raised here once all of the tasks are finished.
+
+        """
+
+        if len(tasks) == 1:
+            func, args = tasks[0]
+            func(*args)
+            return
+
+        if Linter.executor is None:
+            Linter.executor = ThreadPoolExecutor(max_workers=cpu_count() * 2)
+
+        futures = [Linter.executor.submit(func, *args) for func, args in tasks]
+        wait(futures)
+
+        for future in futures:
+            future.result()
+
+    def is_excluded(self, filename, view_settings):
+        """Return whether filename matches a pattern in the "excludes" setting."""
+
+        excludes = util.convert_type(view_settings.get('excludes', []), [])
+
+        for pattern in excludes:
+            if fnmatch(filename, pattern):
+                persist.debug(
+                    '{} skipped \'{}\', excluded by \'{}\''
+                    .format(self.name, filename, pattern)
+                )
+                return True
+
+        return False
+
+    def lint_code(self, code, filename):
+        """
+        Lint the entirety of code.
+
+        If a batch left output for exactly this code (see lint_batches),
+        that output is used instead of running the linter.
+
+        """
+
+        self.reset(code, filename=filename or 'untitled')
+        batch_output, self.batch_output = self.batch_output, None
+
+        if batch_output is not None and batch_output[0] == code:
+            self.lint(output=batch_output[1])
+        else:
+            self.lint()
+            self.record_latency(len(code), self.run_time)
+
+    def lint_sections(self, code, filename, sections):
+        """
+        Lint the given sections of code as embedded code.
+
+        sections is a list of (line_offset, start, end) tuples. Errors
+        in each section are offset to their line in the complete code.
+
+        """
+
+        self.reset(code, filename=filename or 'untitled')
+        errors = {}
+
+        for line_offset, start, end in sections:
+            self.highlight.move_to(line_offset, start)
+            self.code = code[start:end]
+            self.errors = {}
+            self.lint()
+
+            for line, line_errors in self.errors.items():
+                errors[line + line_offset] = line_errors
+
+        self.errors = errors
+        self.record_latency(len(code), self.run_time)
+
+    @staticmethod
+    def size_bucket(size):
+        """
+        Return the file size bucket for code of the given size.
+
+        Bucket 0 holds code under 32K, and each following bucket
+        holds code up to four times as large as the previous one.
+
+        """
+        return max(0, size.bit_length() - 14) // 2
+
+    @classmethod
+    def is_slow(cls, size):
+        """Return whether the linter has been moved out of background mode for code of the given size."""
+        return cls.size_bucket(size) in cls.slow_buckets
+
+    def record_latency(self, size, seconds):
+        """
+        Record how long the linter took to run on code of the given size.
+
+        seconds is the time the linter itself ran (see run_exclusive).
+        If the 90th percentile of the recent latencies for the size exceeds
+        the "background_lint_budget" setting, the linter no longer runs
+        in background mode on code of that size, only when the view is
+        loaded or saved. Once the linter is fast enough again it is moved
+        back into background mode. Cancelled lints are not recorded, nor is
+        the first lint of each size, which pays for cold caches.
+
+        """
+
+        if self.token is not None and self.token.cancelled:
+            return
+
+        cls = self.__class__
+        bucket = cls.size_bucket(size)
+        samples = cls.latencies.get(bucket)
+
+        if samples is None:
+            cls.latencies[bucket] = deque(maxlen=LATENCY_SAMPLES)
+            return
+
+        samples.append(seconds)
+        budget = persist.settings.get('background_lint_budget')
+
+        if not isinstance(budget, Number) or budget <= 0:
+            cls.slow_buckets.clear()
+            return
+
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return
+
+        ordered = sorted(samples)
+        latency = ordered[int((len(ordered) - 1) * 0.9)]
+
+        if bucket in cls.slow_buckets:
+            if latency < budget * LATENCY_RECOVERY:
+                cls.slow_buckets.discard(bucket)
+                self.announce('{} is back in background mode'.format(self.name), latency)
+        elif latency > budget:
+            # Judge recovery only by lints run after the demotion
+            cls.slow_buckets.add(bucket)
+            samples.clear()
+            self.announce('{} is too slow, linting only on load/save'.format(self.name), latency)
+
+    def announce(self, message, latency):
+        """Print a change of lint mode to the console and show it in the status bar."""
+
+        persist.printf(
+            '{} ({:.2f}s at the 90th percentile on {})'
+            .format(message, latency, os.path.basename(self.filename))
+        )
+        sublime.set_timeout(lambda: sublime.status_message('SublimeLinter: ' + message), 0)
 
     def reset(self, code, filename=None):
         """Reset a linter to work on the given code and filename."""
@@ -706,6 +964,7 @@ class Linter(metaclass=Registrar):
         self.code = code
         self.filename = filename or self.filename
         self.highlight = highlight.Highlight(self.code)
+        self.run_time = 0
 
     @classmethod
     def which(cls, cmd):
@@ -792,6 +1051,11 @@ class Linter(metaclass=Registrar):
             return ''
 
         cmd[0:1] = util.convert_type(path, [])
+        return self.insert_args(cmd, settings)
+
+    def insert_args(self, cmd, settings):
+        """Return a tuple with cmd, with the args built by build_args in place of '*' or appended."""
+
         args = self.build_args(settings)
 
         if '*' in cmd:
@@ -923,7 +1187,7 @@ class Linter(metaclass=Registrar):
 
                     options[name] = value
 
-    def lint(self):
+    def lint(self, output=None):
         """
         Perform the lint, retrieve the results, and add marks to the view.
 
@@ -931,7 +1195,7 @@ class Linter(metaclass=Registrar):
 
         1. Ensure the linter has the minimum configuration necessary to lint.
         2. Get the command line. If it is an empty string, bail.
-        3. Run the linter.
+        3. Run the linter, unless output from an earlier run is passed in.
         4. Parse the linter output with the regex.
         5. Highlight warnings and errors.
 
@@ -948,7 +1212,39 @@ class Linter(metaclass=Registrar):
             if cmd is not None and not cmd:
                 return
 
-        output = self.run(cmd, self.code)
+        try:
+            if output is None:
+                output = self.run_exclusive(cmd, self.code)
+        except util.ProcessCancelled:
+            return
+        except util.ProcessSpawnError:
+            self.failed('could not be started')
+            return
+        except util.ServerError:
+            self.failed('server crashed')
+            return
+        except util.ProcessTimeout as ex:
+            persist.printf(
+                '{}: killed after running longer than {}s on {}'
+                .format(self.name, ex.args[1], os.path.basename(self.filename))
+            )
+            self.failed('timed out')
+            return
+        except util.ResourceLimitExceeded as ex:
+            persist.printf(
+                '{}: killed after exceeding its {} limit on {}'
+                .format(self.name, ex.args[1], os.path.basename(self.filename))
+            )
+            self.failed('exceeded its {} limit'.format(ex.args[1]))
+            return
+
+        if self.token is not None and self.token.cancelled:
+            return
+
+        if output and 'Traceback (most recent call last)' in output:
+            self.failed('crashed')
+        elif self.breaker.succeeded():
+            persist.printf('{}: working again, no longer skipped'.format(self.name))
 
         if not output:
             return
@@ -992,6 +1288,17 @@ class Linter(metaclass=Registrar):
 
                 self.error(line, col, message, error_type)
 
+    def failed(self, reason):
+        """Record a failure of the linter with its circuit breaker, reason describes the failure."""
+
+        backoff = self.breaker.failed(reason)
+
+        if backoff is not None:
+            persist.printf(
+                '{}: {} {} times in a row, skipping it for {:g}s'
+                .format(self.name, reason, self.breaker.failures, backoff)
+            )
+
     def draw(self):
         """Draw the marks from the last lint."""
         self.highlight.draw(self.view)
@@ -1162,28 +1469,326 @@ class Linter(metaclass=Registrar):
                                               os.path.basename(self.filename),
                                               cmd or '<builtin>'))
 
-        if self.tempfile_suffix:
+        if self.server_mode:
+            return self.serve(cmd, code)
+        elif self.tempfile_suffix:
             return self.tmpfile(cmd, code, suffix=self.tempfile_suffix)
         else:
             return self.communicate(cmd, code)
 
+    def run_exclusive(self, cmd, code):
+        """
+        Call run and return its output, one lint at a time if the linter is not parallel_safe.
+
+        The time run takes is added to self.run_time, not counting the time
+        spent waiting for the run lock or for the admission controller.
+
+        """
+
+        if self.parallel_safe:
+            return self.timed_run(cmd, code)
+
+        with self.run_lock:
+            return self.timed_run(cmd, code)
+
+    def timed_run(self, cmd, code):
+        """Call run, add the time it took without admission waits to self.run_time, and return its output."""
+
+        waited = util.admission.thread_wait()
+        start = time.monotonic()
+
+        try:
+            return self.run(cmd, code)
+        finally:
+            waited = util.admission.thread_wait() - waited
+            self.run_time += max(0, time.monotonic() - start - waited)
+
+    @classmethod
+    def lint_batches(cls, views):
+        """
+        Run each multiple_files linter once for all views that need the same command line.
+
+        For each of the given views, the linters that can lint it in a batch
+        (see can_batch) are grouped by their class and command line. Each group
+        of two or more linters is run once on temporary copies of their views'
+        code, and the output about each view is saved on its linter. The next
+        lint of the view uses that output instead of running the linter again,
+        as long as the code has not changed.
+
+        This is called by SublimeLinter.lint_all_views from a background thread,
+        before the views are linted.
+
+        """
+
+        groups = {}
+
+        for view in views:
+            linters = cls.get_batch_linters(view.id())
+            code = cls.text(view) if linters else None
+
+            if not code:
+                continue
+
+            syntax = persist.get_syntax(view)
+            filename = view.file_name()
+
+            for linter in linters:
+                # The settings and command line depend on the code, so they are
+                # read from a copy, the view's linter may be linting right now.
+                copy = linter.__class__(view, linter.syntax, filename)
+                copy.reset(code, filename=filename or 'untitled')
+
+                cmd = copy.get_cmd()
+
+                if cmd and copy.can_batch(syntax, cmd):
+                    groups.setdefault((linter.__class__, tuple(cmd)), []).append((linter, copy))
+
+        tasks = [
+            (cls.lint_batch, (cmd, members))
+            for (linter_class, cmd), members in groups.items()
+            if len(members) > 1
+        ]
+
+        if tasks:
+            cls.run_tasks(tasks)
+
+    @classmethod
+    def get_batch_linters(cls, vid):
+        """Return a list of the linters for the view with the given id that can run in a batch."""
+        return [
+            linter for linter in cls.get_linters(vid)
+            if linter.multiple_files and not linter.server_mode and linter.cmd is not None
+        ]
+
+    def can_batch(self, syntax, cmd):
+        """
+        Return whether the linter can lint its code, which has the given syntax, in a batch.
+
+        cmd is the linter's command line. Linters that read the code from
+        stdin are not batched, they would ignore or reject the appended files.
+
+        """
+
+        if syntax in self.selectors:
+            return False
+
+        if not self.tempfile_suffix or any(arg == '-' or arg.startswith('--stdin') for arg in cmd):
+            return False
+
+        view_settings = self.get_view_settings(no_inline=True)
+
+        if view_settings.get('@disable') or not self.breaker.allow():
+            return False
+
+        return not (self.view.file_name() and self.is_excluded(os.path.realpath(self.filename), view_settings))
+
+    @staticmethod
+    def lint_batch(cmd, members):
+        """
+        Run cmd once on the code of several linters of the same class and save the output about each.
+
+        members is a list of (linter, copy) tuples, where copy is a copy of the
+        linter that holds the code to lint. If the run fails, or its output
+        mentions none of the files, e.g. because of a usage error, nothing is
+        saved, and each linter is run on its own at its next lint, which
+        reports the failure if it happens again.
+
+        The views of a batch are not linted until it finishes, so it may run
+        as long as the linter's timeout per file, but no longer than
+        BATCH_TIMEOUT seconds.
+
+        """
+
+        linter = members[0][1]
+        files = [(copy.filename, copy.code) for _, copy in members]
+        timeout = linter.get_timeout()
+
+        if timeout is None:
+            timeout = BATCH_TIMEOUT
+        else:
+            timeout = min(timeout * len(files), BATCH_TIMEOUT)
+
+        def run():
+            return util.tmpfiles(
+                cmd, files, output_stream=linter.error_stream,
+                timeout=timeout, limits=linter.get_limits()
+            )
+
+        persist.debug('{}: linting {} files at once'.format(linter.name, len(files)))
+
+        try:
+            if linter.parallel_safe:
+                outputs = run()
+            else:
+                with linter.run_lock:
+                    outputs = run()
+        except util.ProcessError as ex:
+            persist.debug('{}: batch failed ({}), linting the files one at a time'.format(
+                linter.name, ex.__class__.__name__))
+            return
+
+        if outputs is None:
+            persist.debug('{}: batch output is not about the files, linting them one at a time'.format(
+                linter.name))
+            return
+
+        if any('Traceback (most recent call last)' in output for output in outputs):
+            persist.debug('{}: batch crashed, linting the files one at a time'.format(linter.name))
+            return
+
+        for (member, copy), output in zip(members, outputs):
+            member.batch_output = (copy.code, output)
+
+    def get_timeout(self):
+        """
+        Return the number of seconds the linter's executable may run before it is killed.
+
+        This is the "timeout" linter setting, or if that is not set the global
+        "timeout" setting. If the result is not a positive number, None is
+        returned, meaning there is no timeout.
+
+        """
+
+        timeout = self.get_view_settings().get('timeout')
+
+        if timeout is None:
+            timeout = persist.settings.get('timeout')
+
+        if isinstance(timeout, Number) and timeout > 0:
+            return timeout
+        else:
+            return None
+
+    def get_limits(self):
+        """
+        Return a dict with the resource limits and scheduling priority for the linter's executable.
+
+        The keys are taken from the "memory_limit" (megabytes), "cpu_time_limit"
+        (seconds), "nice" and "io_priority" linter settings, or if one is not
+        set the global setting of the same name. Settings that are zero or
+        invalid are left out, so an empty dict means no limits.
+
+        """
+
+        settings = self.get_view_settings()
+        limits = {}
+
+        for key, name in LIMIT_SETTINGS:
+            value = settings.get(name)
+
+            if value is None:
+                value = persist.settings.get(name)
+
+            if key == 'io_priority':
+                valid = value == 'idle' or (isinstance(value, int) and 0 <= value <= 7)
+            elif key == 'nice':
+                valid = isinstance(value, int) and value > 0
+            else:
+                valid = isinstance(value, Number) and value > 0
+
+            if valid:
+                limits[key] = value
+
+        return limits
+
     # popen wrappers
 
     def communicate(self, cmd, code):
         """Run an external executable using stdin to pass code and return its output."""
-        return util.communicate(cmd, code, output_stream=self.error_stream)
+        return util.communicate(
+            cmd, code, output_stream=self.error_stream,
+            token=self.token, timeout=self.get_timeout(), limits=self.get_limits()
+        )
 
     def tmpfile(self, cmd, code, suffix=''):
         """Run an external executable using a temp file to pass code and return its output."""
-        return util.tmpfile(cmd, code, suffix or self.tempfile_suffix, output_stream=self.error_stream)
+        return util.tmpfile(
+            cmd, code, suffix or self.tempfile_suffix, output_stream=self.error_stream,
+            token=self.token, timeout=self.get_timeout(), limits=self.get_limits()
+        )
 
     def tmpdir(self, cmd, files, code):
         """Run an external executable using a temp dir filled with files and return its output."""
-        return util.tmpdir(cmd, files, self.filename, code, output_stream=self.error_stream)
+        return util.tmpdir(
+            cmd, files, self.filename, code, output_stream=self.error_stream,
+            token=self.token, timeout=self.get_timeout(), limits=self.get_limits()
+        )
 
     def popen(self, cmd, env=None):
         """Run cmd in a subprocess with the given environment and return the output."""
-        return util.popen(cmd, env)
+        return util.popen(cmd, env, limits=self.get_limits())
+
+    # server mode
+
+    def serve(self, cmd, code):
+        """
+        Lint code with the linter's server and return its output.
+
+        If the server command cannot be located, code is linted
+        by running cmd as usual.
+
+        """
+
+        server_cmd = self.get_server_cmd()
+
+        if not server_cmd:
+            return self.communicate(cmd, code)
+
+        response = server.pool.request(
+            server_cmd, self.get_project_root(), self.server_request(cmd, code),
+            timeout=self.get_timeout()
+        )
+
+        return self.server_output(response)
+
+    def get_server_cmd(self):
+        """Return a tuple with the command line that starts the linter's server, or None."""
+
+        cmd = list(self.server_cmd)
+        path = self.which(cmd[0])
+
+        if not path:
+            persist.debug('cannot locate \'{}\''.format(cmd[0]))
+            return None
+
+        cmd[0:1] = util.convert_type(path, [])
+        return tuple(cmd)
+
+    def get_project_root(self):
+        """Return the project folder that contains the view's file, the file's directory, or None."""
+
+        filename = self.view.file_name()
+
+        if not filename:
+            return None
+
+        window = self.view.window()
+
+        for folder in (window.folders() if window else ()):
+            if filename.startswith(os.path.join(folder, '')):
+                return folder
+
+        return os.path.dirname(filename)
+
+    def server_request(self, cmd, code):
+        """
+        Return the payload of a request to the linter's server to lint code.
+
+        By default this is a UTF-8 JSON object with the arguments of cmd
+        (without the executable) as "args", the name of the file as "filename",
+        and the code to lint as "code".
+
+        """
+
+        return json.dumps({
+            'args': list(cmd[1:]),
+            'filename': self.filename,
+            'code': code,
+        }).encode('utf8')
+
+    def server_output(self, response):
+        """Return the linter output from the payload of a response from the linter's server."""
+        return response.decode('utf8')
 
 
 class PythonMeta(Registrar):
@@ -1207,6 +1812,9 @@ class PythonMeta(Registrar):
 
         module = None
 
+        if 'module' in attrs:
+            setattr(self, 'module_name', attrs['module'])
+
         if attrs.get('module') is not None:
             try:
                 module = import_module(attrs['module'])
@@ -1270,6 +1878,15 @@ class PythonLinter(Linter, metaclass=PythonMeta):
         in the "@python" setting, the cmd attribute, or the default system
         python.
 
+    If the "python_workers" setting is on, an executable that is a python
+    script is run by a persistent worker of the selected python instead of
+    a new python process per lint, see python_worker.py.
+
+    If the "isolate_builtin_checks" setting is on and the module would be
+    used, the executable is run by a python worker instead, if possible,
+    so the check does not hold up Sublime Text's plugin host. The workers
+    of a python are a pool, so checks of different views run concurrently.
+
     """
 
     SHEBANG_RE = re.compile(r'\s*#!(?:(?:/[^/]+)*[/ ])?python(?P<version>\d(?:\.\d)?)')
@@ -1290,6 +1907,7 @@ class PythonLinter(Linter, metaclass=PythonMeta):
 
     # Used internally, do not modify.
     python_version = None
+    module_name = None
 
     @staticmethod
     def match_shebang(code):
@@ -1322,6 +1940,12 @@ class PythonLinter(Linter, metaclass=PythonMeta):
                     version = util.find_python(version=version, module=self.module)
                     use_module = version[0] == '<builtin>'
 
+            if use_module and persist.settings.get('isolate_builtin_checks'):
+                worker_cmd = self.get_worker_cmd()
+
+                if self.can_use_worker(worker_cmd):
+                    return self.run_in_worker(worker_cmd, code)
+
             if use_module:
                 if persist.settings.get('debug'):
                     persist.printf(
@@ -1349,8 +1973,89 @@ class PythonLinter(Linter, metaclass=PythonMeta):
             cmd = self.cmd
 
         cmd = self.build_cmd(cmd=cmd)
+
+        if persist.settings.get('python_workers') and self.can_use_worker(cmd):
+            return self.run_in_worker(cmd, code)
+
         return super().run(cmd, code)
 
+    def get_worker_cmd(self):
+        """
+        Return the command line that runs the linter's script with a python worker, or None.
+
+        When the module is used, build_cmd resolves the linter's python to
+        '<builtin>', so the python selected by the "@python" setting (or the
+        version in cmd) and the script named in cmd are located here instead.
+
+        """
+
+        if not self._cmd:
+            return None
+
+        cmd = shlex.split(self._cmd) if isinstance(self._cmd, str) else list(self._cmd)
+        settings = self.get_view_settings()
+        match = util.PYTHON_CMD_RE.match(cmd[0])
+
+        if match:
+            script, version = match.group('script'), match.group('version')
+        else:
+            script, version = cmd[0], None
+
+        version = settings.get('@python', version)
+
+        if not script:
+            return None
+
+        python, script_path = util.find_python(
+            version=str(version) if version is not None else None, script=script, module=None
+        )[0:2]
+
+        if not python or not script_path:
+            return None
+
+        cmd[0:1] = [python, script_path]
+        return self.insert_args(cmd, settings)
+
+    def can_use_worker(self, cmd):
+        """Return True if cmd runs a python script that a python worker can run."""
+
+        return bool(
+            cmd and len(cmd) > 1 and
+            not self.server_mode and not self.tempfile_suffix and
+            os.path.basename(cmd[0]).lower().startswith('python') and
+            os.path.isfile(cmd[1])
+        )
+
+    def run_in_worker(self, cmd, code):
+        """
+        Run the python script of cmd in a persistent worker of its python and return the output.
+
+        Each python has a pool of workers, as many as the lint worker threads
+        (see Daemon.get_worker_count), so lints of different views do not
+        wait for each other.
+
+        """
+
+        if persist.settings.get('debug'):
+            persist.printf('{}: {} {} <worker>'.format(self.name, os.path.basename(self.filename), cmd))
+
+        request = json.dumps({
+            'argv': list(cmd[1:]),
+            'code': code,
+            'modules': [self.module_name] if self.module_name else [],
+        }).encode('utf8')
+
+        response = server.pool.request(
+            (cmd[0], PYTHON_WORKER), None, request,
+            timeout=self.get_timeout(), size=queue.get_worker_count()
+        )
+        response = json.loads(response.decode('utf8'))
+
+        return util.combine_output(
+            (response['stdout'].encode('utf8'), response['stderr'].encode('utf8')),
+            output_stream=self.error_stream
+        )
+
     def check(self, code, filename):
         """
         Run a built-in check of code, returning errors.
@@ -0,0 +1,149 @@
+#
+# python_worker.py
+# Part of SublimeLinter3, a code checking framework for Sublime Text 3
+#
+# Written by Ryan Hileman and Aparajita Fishman
+#
+# Project: https://github.com/SublimeLinter/SublimeLinter3
+# License: MIT
+#
+
+"""
+A persistent python worker that runs python linter scripts.
+
+This script is not imported by SublimeLinter, it is run as a linter server
+(see server.py) by the python selected with the @python setting, which may
+be any version of python 2 or 3. It runs python scripts in its own process
+instead of a new interpreter per lint, so modules the scripts import are
+only imported once.
+
+Each request is a length-prefixed JSON object with the following keys:
+
+argv     - The script to run followed by its arguments.
+code     - The text to pass to the script on stdin.
+modules  - Names of modules to import before the script is run.
+
+The response is a length-prefixed JSON object with the script's output
+as "stdout" and "stderr".
+
+"""
+
+import io
+import json
+import os
+import runpy
+import struct
+import sys
+import traceback
+
+HEADER = struct.Struct('>I')
+
+
+def read_exactly(stream, size):
+    """Read size bytes from stream, return None if the stream ends first."""
+
+    data = b''
+
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+
+        if not chunk:
+            return None
+
+        data += chunk
+
+    return data
+
+
+def text_stream():
+    """Return an in-memory stream that can be used as sys.stdout or sys.stderr."""
+
+    if sys.version_info[0] >= 3:
+        return io.TextIOWrapper(io.BytesIO(), encoding='utf8', errors='replace')
+    else:
+        return io.BytesIO()
+
+
+def stream_text(stream):
+    """Return the text written to a stream returned by text_stream."""
+
+    if sys.version_info[0] >= 3:
+        stream.flush()
+        return stream.buffer.getvalue().decode('utf8', 'replace')
+    else:
+        return stream.getvalue().decode('utf8', 'replace')
+
+
+def run(request):
+    """Run the script of request and return its stdout and stderr as a dict."""
+
+    for name in request.get('modules') or ():
+        if name not in sys.modules:
+            try:
+                __import__(name)
+            except Exception:
+                pass
+
+    code = request.get('code', '').encode('utf8')
+
+    if sys.version_info[0] >= 3:
+        stdin = io.TextIOWrapper(io.BytesIO(code), encoding='utf8')
+    else:
+        stdin = io.BytesIO(code)
+
+    stdout, stderr = text_stream(), text_stream()
+    saved = sys.argv, sys.stdin, sys.stdout, sys.stderr
+    sys.argv = list(request['argv'])
+    sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+
+    # Like python itself, put the directory of the script first in sys.path
+    sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))
+
+    try:
+        runpy.run_path(sys.argv[0], run_name='__main__')
+    except SystemExit:
+        pass
+    except Exception:
+        traceback.print_exc()
+    finally:
+        sys.argv, sys.stdin, sys.stdout, sys.stderr = saved
+        del sys.path[0]
+
+    return {'stdout': stream_text(stdout), 'stderr': stream_text(stderr)}
+
+
+def main():
+    """Serve requests until stdin is closed."""
+
+    # The directory of this script is SublimeLinter's lint directory,
+    # whose modules (e.g. queue.py) would shadow the standard library.
+    del sys.path[0]
+
+    # Keep the real stdin and stdout for requests and responses. Anything
+    # written to file descriptor 1 by the scripts goes to stderr, and
+    # file descriptor 0 reads nothing, so the scripts cannot touch the frames.
+    requests = os.fdopen(os.dup(0), 'rb')
+    responses = os.fdopen(os.dup(1), 'wb')
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    os.dup2(2, 1)
+
+    while True:
+        header = read_exactly(requests, HEADER.size)
+
+        if header is None:
+            break
+
+        payload = read_exactly(requests, HEADER.unpack(header)[0])
+
+        if payload is None:
+            break
+
+        response = json.dumps(run(json.loads(payload.decode('utf8')))).encode('utf8')
+        responses.write(HEADER.pack(len(response)) + response)
+        responses.flush()
+
+
+if __name__ == '__main__':
+    main()
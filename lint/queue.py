@@ -10,7 +10,10 @@
 
 """This module provides a threaded queue for lint requests."""
 
-from queue import Queue, Empty
+from collections import deque
+import heapq
+from multiprocessing import cpu_count
+import os
 import threading
 import traceback
 import time
@@ -18,32 +21,159 @@ import sys
 
 from . import persist, util
 
+# Lint priorities, lowest value first. Lints requested by a save come first,
+# then the active view in the focused window, then views visible in other
+# groups, then hidden views.
+PRIORITY_SAVE = -1
+PRIORITY_ACTIVE = 0
+PRIORITY_VISIBLE = 1
+PRIORITY_HIDDEN = 2
+
+
+class Request:
+
+    """
+    A pending lint request for a view.
+
+    timestamp is the time of the latest hit and deadline is the time at which
+    the lint is due. scheduled is the deadline of the request's entry in the
+    daemon's deadline heap. priority, if not None, overrides the view's
+    priority, and callbacks are called with the view id after the lint,
+    if it completes.
+    background is True if every hit merged into the request came from
+    typing in background lint mode. size is the size of the view's text.
+
+    Once a request is ready to run, its deadline is the time at which
+    it first came due.
+
+    """
+
+    def __init__(self, view_id, timestamp, deadline):
+        self.view_id = view_id
+        self.timestamp = timestamp
+        self.deadline = deadline
+        self.scheduled = None
+        self.priority = None
+        self.callbacks = []
+        self.background = True
+        self.size = 0
+
+    def merge(self, request):
+        """Take over the priority and callbacks of an older request for the same view."""
+
+        if request.priority is not None and (self.priority is None or request.priority < self.priority):
+            self.priority = request.priority
+
+        self.callbacks[0:0] = request.callbacks
+        self.background = self.background and request.background
+        self.deadline = min(self.deadline, request.deadline)
+
 
 class Daemon:
 
     """
     This class provides a threaded queue that dispatches lints.
 
-    The following operations can be added to the queue:
+    The following operations are supported:
 
-    hit - Queue a lint for a given view
-    delay - Queue a delay for a number of milliseconds
+    hit - Request a lint for a given view
+    delay - Pause dispatching for a number of milliseconds
     reload - Indicates the main plugin was reloaded
 
+    Lint requests are coalesced: each view has at most one pending request,
+    holding the time of its latest hit and the time at which it is due.
+
+    When a lint is due, it is handed off to a pool of worker threads,
+    so a slow linter in one view does not hold up linting of other views.
+    A view is never linted by more than one worker at a time.
+
+    Each running lint has a cancel token. When a view is hit again,
+    the lint running for the previous version of its text is cancelled,
+    since its results would be discarded anyway.
+
+    Due lints are taken by workers in priority order, cheapest first within
+    a priority. Hidden views are only linted when no other view is being linted.
+
+    When the system is under load, delays are stretched and fewer
+    workers run lints at once.
+
     """
 
     MIN_DELAY = 0.1
     running = False
     callback = None
-    q = Queue()
-    last_runs = {}
+
+    # All of the state below is guarded by lock. The daemon thread waits on
+    # scheduled until the next request is due, workers wait on available
+    # until there is a lint they can run.
+    lock = threading.Lock()
+    scheduled = threading.Condition(lock)
+    available = threading.Condition(lock)
+
+    # A mapping between view ids and their pending Request, and a min-heap
+    # of (deadline, view_id) tuples. A heap entry whose deadline does not match
+    # the scheduled deadline of its request has been superseded.
+    requests = {}
+    deadlines = []
+    paused_until = 0
+    peak_depth = 0
+
+    # A mapping between view ids and the Request of a due lint that is
+    # waiting for a worker, and the ids of views being linted by a worker.
+    ready = {}
+    busy = set()
+    workers = []
+
+    # A mapping between view ids and their lint priority
+    priorities = {}
+
+    # When the "adaptive_delay" setting is on, the delay is calculated from
+    # the recent lint durations of a view and the recent intervals between
+    # hits of that view (i.e. the typing cadence). Intervals longer than
+    # MAX_TYPING_INTERVAL are pauses, not typing, and are ignored.
+    HISTORY_LENGTH = 8
+    MAX_TYPING_INTERVAL = 1.0
+    durations = {}
+    intervals = {}
+    last_hits = {}
+
+    # A mapping between view ids and the cancel token of their running lint
+    tokens = {}
+
+    # Of the ready lints with the same priority, the cheapest is run first.
+    # Each second a lint waits makes it count as AGING_RATE seconds cheaper,
+    # so expensive lints are not starved.
+    AGING_RATE = 1.0
+
+    # The delay before a background lint is scaled by the cost class of the
+    # view's most costly linter, and a lint with no history is assumed to take
+    # a number of seconds per linter, according to the linter's cost class.
+    COST_DELAY_FACTORS = {'low': 0.5, 'medium': 1, 'high': 2}
+    COST_ESTIMATES = {'low': 0.05, 'medium': 0.2, 'high': 1.0}
+
+    # The delay is also scaled by this if all of the view's linters are line local
+    LINE_LOCAL_DELAY_FACTOR = 0.5
+
+    # A mapping between view ids and their delay before adaptation and
+    # throttling. Looking up the delay reads .sublimelinterrc files, so it
+    # is cached, and is only updated when a view is activated, its syntax
+    # changes or the settings change, never on a keystroke.
+    delays = {}
+
+    # Under full system load delays are THROTTLE_DELAY_FACTOR times longer
+    # and a single worker runs lints. The load is sampled at most every
+    # LOAD_SAMPLE_INTERVAL seconds.
+    THROTTLE_DELAY_FACTOR = 4
+    LOAD_SAMPLE_INTERVAL = 1.0
+    throttle = 0
+    throttle_sampled = None
 
     def start(self, callback):
         """Start the daemon thread that runs loop."""
         self.callback = callback
 
         if self.running:
-            self.q.put('reload')
+            self.reload()
         else:
             # Make sure the system python 3 paths are available to plugins.
             # We do this here to ensure it is only done once, even if the
@@ -53,88 +183,601 @@ class Daemon:
             self.running = True
             threading.Thread(target=self.loop).start()
 
+    def reload(self):
+        """Discard all pending lints when the main plugin is reloaded."""
+
+        persist.printf('daemon detected a reload')
+
+        with self.lock:
+            self.requests.clear()
+            del self.deadlines[:]
+            self.ready.clear()
+
     def loop(self):
-        """Continually check the queue for new items and process them."""
+        """
+        Continually move lint requests to the workers as they come due.
+
+        Pending requests are kept in a min-heap ordered by the time at which
+        they are due, so the loop sleeps until either the next request is due
+        or an earlier request is made, and never wakes up otherwise.
+
+        """
+
+        with self.lock:
+            while True:
+                try:
+                    now = time.monotonic()
+
+                    if now < self.paused_until:
+                        timeout = self.paused_until - now
+                    else:
+                        self.dispatch(now)
+
+                        if self.deadlines:
+                            timeout = self.deadlines[0][0] - now
+                        else:
+                            timeout = None
+
+                    self.scheduled.wait(timeout)
+                except:
+                    persist.printf('error in SublimeLinter daemon:')
+                    persist.printf('-' * 20)
+                    persist.printf(traceback.format_exc())
+                    persist.printf('-' * 20)
+
+    def request(self, view_id, timestamp, deadline, priority=None, callback=None, background=False, size=0):
+        """
+        Record a lint request for a view, replacing any pending request for it.
+
+        This must be called with the lock held.
+
+        """
+
+        request = self.requests.get(view_id)
+
+        if request is None:
+            request = self.requests[view_id] = Request(view_id, timestamp, deadline)
+        else:
+            request.timestamp, request.deadline = timestamp, deadline
+
+        request.size = size
+
+        if priority is not None and (request.priority is None or priority < request.priority):
+            request.priority = priority
+
+        if callback is not None:
+            request.callbacks.append(callback)
+
+        if not background:
+            request.background = False
+
+        # Only an earlier deadline needs a new heap entry. If the deadline
+        # is later, the existing entry is moved when it comes due.
+        if request.scheduled is None or deadline < request.scheduled:
+            request.scheduled = deadline
+            heapq.heappush(self.deadlines, (deadline, view_id))
+            self.scheduled.notify()
+
+        depth = len(self.requests) + len(self.ready)
+
+        if depth > self.peak_depth:
+            self.peak_depth = depth
+            persist.debug('lint queue depth reached', depth)
+
+    def dispatch(self, now):
+        """
+        Hand off due requests to the worker pool.
+
+        If a view already has a lint waiting for a worker, the newer lint
+        replaces it. If a view is being linted, the lint waits until the
+        running lint finishes.
+
+        This must be called with the lock held.
+
+        """
 
-        last_runs = {}
+        dispatched = False
+
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, view_id = heapq.heappop(self.deadlines)
+            request = self.requests.get(view_id)
+
+            if request is None or request.scheduled != deadline:
+                continue
+
+            if request.deadline > now:
+                request.scheduled = request.deadline
+                heapq.heappush(self.deadlines, (request.deadline, view_id))
+                continue
+
+            del self.requests[view_id]
+
+            if view_id in self.ready:
+                request.merge(self.ready[view_id])
+
+            self.ready[view_id] = request
+            dispatched = True
+
+        if dispatched:
+            self.start_workers()
+            self.available.notify_all()
+
+    def start_workers(self):
+        """Start worker threads until the pool has the configured number of workers."""
+        while len(self.workers) < self.get_worker_count():
+            worker = threading.Thread(target=self.work)
+            self.workers.append(worker)
+            worker.start()
+
+    def next_job(self):
+        """
+        Return the id of the ready view that should be linted next, or None.
+
+        Views that are being linted are skipped. Of the rest, the view with
+        the highest priority is chosen, and of views with the same priority,
+        the one with the lowest estimated cost less its time spent waiting.
+        Hidden views are only chosen when no view is being linted, and
+        views with a linter that is not parallel_safe are not chosen
+        while that linter is running in another view.
+
+        If the number of running lints has reached the limit returned by
+        get_worker_limit, None is returned.
+
+        This must be called with the lock held.
+
+        """
+
+        if len(self.busy) >= self.get_worker_limit():
+            return None
+
+        now = time.monotonic()
+        best_id = best_key = None
+        exclusive = set()
+
+        for view_id in self.busy:
+            for linter in persist.view_linters.get(view_id, ()):
+                if not linter.parallel_safe:
+                    exclusive.add(linter.__class__)
+
+        for view_id, request in self.ready.items():
+            if view_id in self.busy:
+                continue
+
+            if exclusive and any(
+                linter.__class__ in exclusive for linter in persist.view_linters.get(view_id, ())
+            ):
+                continue
+
+            priority = request.priority
+
+            if priority is None:
+                priority = self.get_priority(view_id)
+
+            if priority >= PRIORITY_HIDDEN and self.busy:
+                continue
+
+            cost = self.estimate_cost(view_id, request.size)
+            key = (priority, cost - self.AGING_RATE * (now - request.deadline))
+
+            if best_id is None or key < best_key:
+                best_id, best_key = view_id, key
+
+        return best_id
+
+    def estimate_cost(self, view_id, size):
+        """
+        Return the estimated number of seconds a lint of the view with the given id will take.
+
+        This is the median of the view's recent lint durations. If the view has
+        not been linted yet, it is the sum of the median latencies of its
+        linters on text of the given size. Linters without any history are
+        assumed to take the time given by their cost class.
+
+        This must be called with the lock held.
+
+        """
+
+        durations = self.durations.get(view_id)
+
+        if durations:
+            return sorted(durations)[len(durations) // 2]
+
+        cost = 0
+
+        for linter in persist.view_linters.get(view_id, ()):
+            latencies = linter.latencies.get(linter.size_bucket(size)) if linter.latencies else None
+
+            if latencies:
+                cost += sorted(latencies)[len(latencies) // 2]
+            else:
+                cost += self.COST_ESTIMATES.get(linter.cost, 0)
+
+        return cost
+
+    def work(self):
+        """Continually take due lints from the ready lints and run them."""
 
         while True:
+            with self.lock:
+                view_id = self.next_job()
+
+                while view_id is None:
+                    self.available.wait()
+                    view_id = self.next_job()
+
+                request = self.ready.pop(view_id)
+                token = util.CancelToken()
+                self.busy.add(view_id)
+                self.tokens[view_id] = token
+
+            start = time.monotonic()
+
             try:
-                try:
-                    item = self.q.get(block=True, timeout=self.MIN_DELAY)
-                except Empty:
-                    for view_id, (timestamp, delay) in last_runs.copy().items():
-                        # Lint the view if we have gone past the time
-                        # at which the lint wants to run.
-                        if time.monotonic() > timestamp + delay:
-                            self.last_runs[view_id] = time.monotonic()
-                            del last_runs[view_id]
-                            self.lint(view_id, timestamp)
-
-                    continue
-
-                if isinstance(item, tuple):
-                    view_id, timestamp, delay = item
-
-                    if view_id in self.last_runs and timestamp < self.last_runs[view_id]:
-                        continue
-
-                    last_runs[view_id] = timestamp, delay
-
-                elif isinstance(item, (int, float)):
-                    time.sleep(item)
-
-                elif isinstance(item, str):
-                    if item == 'reload':
-                        persist.printf('daemon detected a reload')
-                        self.last_runs.clear()
-                        last_runs.clear()
-                else:
-                    persist.printf('unknown message sent to daemon:', item)
+                completed = self.lint(view_id, request.timestamp, token, background=request.background)
+
+                # Callbacks expect current results, which a cancelled or stale lint does not have
+                if completed and not token.cancelled:
+                    for callback in request.callbacks:
+                        callback(view_id)
             except:
-                persist.printf('error in SublimeLinter daemon:')
+                persist.printf('error in SublimeLinter worker:')
                 persist.printf('-' * 20)
                 persist.printf(traceback.format_exc())
                 persist.printf('-' * 20)
 
-    def hit(self, view):
-        """Add a lint request to the queue, return the time at which the request was enqueued."""
+            with self.lock:
+                self.busy.discard(view_id)
+                del self.tokens[view_id]
+
+                # A cancelled lint did not run to completion, so its duration is meaningless
+                if not token.cancelled:
+                    self.record(self.durations, view_id, time.monotonic() - start)
+
+                self.available.notify_all()
+
+    def get_priority(self, view_id):
+        """Return the lint priority of the view with the given id."""
+        return self.priorities.get(view_id, PRIORITY_VISIBLE)
+
+    def set_priorities(self, priorities):
+        """
+        Set the lint priorities of views.
+
+        priorities is a mapping between view ids and one of the PRIORITY_*
+        constants. Views not in the mapping are treated as visible.
+
+        """
+
+        with self.lock:
+            self.priorities = priorities
+            self.available.notify_all()
+
+    def metrics(self):
+        """
+        Return a dict with the current state of the queue.
+
+        pending is the number of requests that are not yet due, ready is the
+        number of due lints waiting for a worker, running is the number of
+        lints being run, and peak_depth is the largest number of pending
+        and ready lints seen so far.
+
+        """
+
+        with self.lock:
+            return {
+                'pending': len(self.requests),
+                'ready': len(self.ready),
+                'running': len(self.busy),
+                'peak_depth': self.peak_depth,
+            }
+
+    def hit(self, view, delay=None, priority=None, callback=None, background=False):
+        """
+        Add a lint request to the queue, return the time at which the request was enqueued.
+
+        If delay is None, the lint is due after the delay returned by get_delay
+        and the hit counts towards the view's typing cadence. Otherwise the lint
+        is due after delay seconds.
+
+        If priority is not None, it overrides the view's priority for this lint.
+        If callback is not None, it is called with the view id on the worker
+        thread once the lint has completed, but not if it was cancelled or the
+        view was modified again. background is True if the hit comes from typing
+        in background lint mode.
+
+        If the view is being linted, that lint is cancelled.
+
+        """
+
         timestamp = time.monotonic()
-        self.q.put((view.id(), timestamp, self.get_delay(view)))
+        vid = view.id()
+        self.cancel(vid)
+
+        if delay is None:
+            typing = True
+            delay = self.get_delay(view)
+        else:
+            typing = False
+
+        with self.lock:
+            if typing:
+                if vid in self.last_hits and timestamp - self.last_hits[vid] <= self.MAX_TYPING_INTERVAL:
+                    self.record(self.intervals, vid, timestamp - self.last_hits[vid])
+
+                self.last_hits[vid] = timestamp
+
+            self.request(
+                vid, timestamp, timestamp + delay,
+                priority=priority, callback=callback, background=background, size=view.size()
+            )
+
         return timestamp
 
+    def record(self, history, view_id, value):
+        """Add value to the recent history of the view with the given id."""
+        if view_id not in history:
+            history[view_id] = deque(maxlen=self.HISTORY_LENGTH)
+
+        history[view_id].append(value)
+
+    def cancel(self, view_id):
+        """Cancel the running lint of the view with the given id, if any."""
+
+        with self.lock:
+            token = self.tokens.get(view_id)
+
+        if token is not None:
+            token.cancel()
+
+    def forget(self, view_id):
+        """Discard everything learned about the view with the given id, which has closed."""
+        with self.lock:
+            for history in (self.durations, self.intervals, self.last_hits):
+                history.pop(view_id, None)
+
+        self.delays.pop(view_id, None)
+
     def delay(self, milliseconds=100):
-        """Add a millisecond delay to the queue."""
-        self.q.put(milliseconds / 1000.0)
+        """Pause dispatching of due lints for a number of milliseconds."""
+
+        with self.lock:
+            self.paused_until = time.monotonic() + milliseconds / 1000.0
+            self.scheduled.notify()
 
-    def lint(self, view_id, timestamp):
+    def lint(self, view_id, timestamp, token=None, background=False):
         """
         Call back into the main plugin to lint the given view.
 
         timestamp is used to determine if the view has been modified
-        since the lint was requested.
+        since the lint was requested. token is the util.CancelToken
+        used to cancel the lint, and background is True if the lint
+        was triggered by typing in background lint mode.
+
+        Return True if the lint ran to completion with current results.
 
         """
-        self.callback(view_id, timestamp)
+        return self.callback(view_id, timestamp, token=token, background=background)
 
     def get_delay(self, view):
         """
         Return the delay between a lint request and when it will be processed.
 
-        If the lint mode is not background, there is no delay. Otherwise, if
-        a "delay" setting is not available in any of the settings, MIN_DELAY is used.
+        If the lint mode is not background, there is no delay. Otherwise the
+        view's cached delay is used, see update_delay.
+
+        If the "adaptive_delay" setting is on, that delay is only used until
+        enough has been learned about the view to calculate an adaptive delay.
+
+        The delay is stretched when the system is under load. This is called
+        on every keystroke, so the throttling last sampled by the workers
+        is used, see get_throttle.
 
         """
 
         if persist.settings.get('lint_mode') != 'background':
             return 0
 
+        delay = self.delays.get(view.id())
+
+        if delay is None:
+            delay = self.update_delay(view)
+
+        if persist.settings.get('adaptive_delay'):
+            delay = self.get_adaptive_delay(view.id(), delay)
+
+        return delay * (1 + (self.THROTTLE_DELAY_FACTOR - 1) * self.throttle)
+
+    def update_delay(self, view):
+        """
+        Look up, cache and return the delay of the given view before adaptation and throttling.
+
+        This is the "delay" setting from the view's .sublimelinterrc, or the
+        global "delay" setting, or MIN_DELAY if neither is set, scaled by the
+        cost class of the view's most costly linter. If all of the view's
+        linters are line local, a lint in the middle of an edit only affects
+        the edited line, so the delay is shortened, but not below MIN_DELAY.
+
+        """
+
         delay = (util.get_view_rc_settings(view) or {}).get('delay')
 
         if delay is None:
             delay = persist.settings.get('delay', self.MIN_DELAY)
 
+        linters = persist.view_linters.get(view.id(), ())
+        factors = [self.COST_DELAY_FACTORS.get(linter.cost, 1) for linter in linters]
+
+        if factors:
+            delay *= max(factors)
+
+            if all(linter.line_local for linter in linters):
+                delay = min(delay, max(self.MIN_DELAY, delay * self.LINE_LOCAL_DELAY_FACTOR))
+
+        self.delays[view.id()] = delay
         return delay
 
+    def clear_delays(self):
+        """
+        Recompute the cached delays of all views, e.g. because the settings changed.
+
+        Looking up a delay reads .sublimelinterrc files, so instead of leaving
+        that to the next keystroke in each view, the delays are recomputed on
+        a background thread. Until then, the old delays are used.
+
+        """
+
+        views = list(persist.views.values())
+
+        for view_id in set(self.delays) - set(view.id() for view in views):
+            self.delays.pop(view_id, None)
+
+        threading.Thread(target=self.update_delays, args=(views,), daemon=True).start()
+
+    def update_delays(self, views):
+        """Call update_delay for each of views."""
+
+        for view in views:
+            try:
+                self.update_delay(view)
+            except Exception:
+                # The view may have been closed in the meantime
+                self.delays.pop(view.id(), None)
+
+    def get_adaptive_delay(self, view_id, delay):
+        """
+        Return a delay for the view with the given id based on its lint cost and typing cadence.
+
+        If a lint usually finishes before the next keystroke, there is no point
+        in waiting, so the delay is the typical lint duration. Otherwise the
+        delay is twice the typical interval between keystrokes, so the lint
+        starts during a real pause in typing instead of being restarted
+        on the next keystroke.
+
+        The result is limited to the range given by the "adaptive_delay_min"
+        and "adaptive_delay_max" settings. If the view has not been linted
+        or typed in yet, delay is returned.
+
+        """
+
+        with self.lock:
+            durations = sorted(self.durations.get(view_id, ()))
+            intervals = sorted(self.intervals.get(view_id, ()))
+
+        if not durations or not intervals:
+            return delay
+
+        # Use the medians, which are not thrown off by the odd outlier
+        cost = durations[len(durations) // 2]
+        cadence = intervals[len(intervals) // 2]
+
+        if cost <= cadence:
+            adaptive_delay = cost
+        else:
+            adaptive_delay = cadence * 2
+
+        minimum = persist.settings.get('adaptive_delay_min', self.MIN_DELAY / 2)
+        maximum = persist.settings.get('adaptive_delay_max', 1.0)
+        adaptive_delay = max(minimum, min(adaptive_delay, maximum))
+
+        persist.debug(
+            'delay for view {}: {:.3f}s (lint {:.3f}s, typing {:.3f}s)'
+            .format(view_id, adaptive_delay, cost, cadence)
+        )
+
+        return adaptive_delay
+
+    def get_worker_count(self):
+        """
+        Return the number of worker threads that run lints.
+
+        This is the "lint_workers" setting, or the number of CPUs
+        if that setting is not a positive number.
+
+        """
+
+        count = persist.settings.get('lint_workers', 0)
+
+        if not isinstance(count, int) or count < 1:
+            count = cpu_count()
+
+        return count
+
+    def get_worker_limit(self):
+        """Return the number of workers that may run lints at once given the system load."""
+        return max(1, round(self.get_worker_count() * (1 - self.get_throttle())))
+
+    def get_throttle(self):
+        """
+        Return how much linting is throttled because of system load, from 0 (not at all) to 1.
+
+        Two measures of load are used: the 1 minute load average per CPU, and
+        on Linux, if available, the percentage of the last 10 seconds in which
+        some task was waiting for a CPU, from /proc/pressure/cpu. The settings
+        "throttle_load" and "throttle_pressure" are [low, high] thresholds for
+        each measure. Below low there is no throttling, above high there is
+        full throttling, and in between throttling increases linearly.
+        The larger of the two results is used.
+
+        """
+
+        now = time.monotonic()
+
+        if self.throttle_sampled is not None and now - self.throttle_sampled < self.LOAD_SAMPLE_INTERVAL:
+            return self.throttle
+
+        self.throttle_sampled = now
+        load, pressure = self.sample_load()
+        throttle = round(max(
+            self.scale_load(load, persist.settings.get('throttle_load')),
+            self.scale_load(pressure, persist.settings.get('throttle_pressure'))
+        ), 2)
+
+        if throttle != self.throttle:
+            self.throttle = throttle
+            count = self.get_worker_count()
+            persist.debug(
+                'system load {}, cpu pressure {}: delays x{:.2f}, {} of {} workers'
+                .format(
+                    'n/a' if load is None else '{:.2f} per cpu'.format(load),
+                    'n/a' if pressure is None else '{:.1f}%'.format(pressure),
+                    1 + (self.THROTTLE_DELAY_FACTOR - 1) * throttle,
+                    max(1, round(count * (1 - throttle))), count
+                )
+            )
+
+        return throttle
+
+    @staticmethod
+    def sample_load():
+        """Return the load average per CPU and the cpu pressure percentage, either may be None."""
+
+        try:
+            load = os.getloadavg()[0] / cpu_count()
+        except (AttributeError, OSError):
+            load = None
+
+        try:
+            # The first line is e.g. "some avg10=1.23 avg60=0.80 avg300=0.50 total=123456"
+            with open('/proc/pressure/cpu') as f:
+                pressure = float(f.readline().split()[1].split('=')[1])
+        except (OSError, IndexError, ValueError):
+            pressure = None
+
+        return load, pressure
+
+    @staticmethod
+    def scale_load(value, thresholds):
+        """Return where value lies between the [low, high] thresholds, from 0 to 1."""
+
+        if value is None or not isinstance(thresholds, (list, tuple)) or len(thresholds) != 2:
+            return 0
+
+        low, high = thresholds
+
+        if not all(isinstance(n, (int, float)) for n in thresholds) or high <= low:
+            return 0
+
+        return max(0, min(1, (value - low) / (high - low)))
+
 
 queue = Daemon()
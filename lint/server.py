@@ -0,0 +1,316 @@
+#
+# server.py
+# Part of SublimeLinter3, a code checking framework for Sublime Text 3
+#
+# Written by Ryan Hileman and Aparajita Fishman
+#
+# Project: https://github.com/SublimeLinter/SublimeLinter3
+# License: MIT
+#
+
+"""
+This module provides persistent linter servers.
+
+Linters whose tools have a daemon variant can set server_mode, in which case
+long-lived server processes are started per server command line and project
+root, instead of a process per lint. Most of the cost of a lint is often the
+startup of an interpreter or virtual machine, which a server only pays once.
+
+Requests and responses are exchanged over the server's stdin and stdout as
+frames: a 4 byte big-endian length followed by that many bytes of payload.
+A server handles one request at a time, and the pool may start several
+servers for the same command line, see ServerPool.request. What goes in
+the payloads is up to the linter, see Linter.server_request and
+Linter.server_output.
+
+A server that exits is restarted on the next request, and a server that has
+been idle for longer than the "server_idle_timeout" setting is shut down.
+
+"""
+
+import struct
+import subprocess
+import threading
+import time
+
+from . import persist, util
+
+HEADER = struct.Struct('>I')
+
+
+def write_frame(stream, payload):
+    """Write payload to stream as a length-prefixed frame."""
+    stream.write(HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def read_frame(stream):
+    """Read a length-prefixed frame from stream and return its payload."""
+    length, = HEADER.unpack(read_exactly(stream, HEADER.size))
+    return read_exactly(stream, length)
+
+
+def read_exactly(stream, size):
+    """Read size bytes from stream, raise EOFError if the stream ends first."""
+
+    data = b''
+
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+
+        if not chunk:
+            raise EOFError
+
+        data += chunk
+
+    return data
+
+
+class Server:
+
+    """A long-lived linter process that handles lint requests one at a time."""
+
+    def __init__(self, cmd, cwd=None):
+        self.cmd = cmd
+        self.cwd = cwd
+        self.proc = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.expired = False
+        self.closed = False
+
+        # The number of threads that checked the server out of the pool, see ServerPool.request
+        self.users = 0
+
+    def start(self):
+        """Start the server process. The lock must be held."""
+
+        self.proc = util.popen(self.cmd, cwd=self.cwd)
+
+        if self.proc is None:
+            raise util.ProcessSpawnError(self.cmd)
+
+        # Nobody else reads the server's stderr, and a full pipe would block it
+        threading.Thread(target=self.drain, args=(self.proc,), daemon=True).start()
+        persist.debug('started server', repr(self.cmd), 'in', self.cwd)
+
+    @staticmethod
+    def drain(proc):
+        """Read and log the stderr of proc until it exits."""
+
+        for line in proc.stderr:
+            persist.debug('server:', line.decode('utf8', 'replace').rstrip())
+
+    def request(self, payload, timeout=None):
+        """
+        Send payload to the server and return the payload of its response.
+
+        If the server is not running, it is started. If it exits before
+        responding, it is restarted and the request is sent once more,
+        and if that fails too, ServerError is raised.
+
+        If timeout is not None and the server does not respond within
+        timeout seconds, the server is killed and ProcessTimeout is raised.
+
+        Once the server has been closed, ServerError is raised.
+
+        """
+
+        with self.lock:
+            try:
+                return self.exchange(payload, timeout)
+            finally:
+                # A server that was closed during the request is cleaned up here, see close
+                if self.closed:
+                    self.stop()
+
+    def exchange(self, payload, timeout):
+        """Send payload to the server and return its response, see request. The lock must be held."""
+
+        self.last_used = time.monotonic()
+
+        for attempt in range(2):
+            if self.closed:
+                raise util.ServerError(self.cmd)
+
+            if self.proc is None or self.proc.poll() is not None:
+                if self.proc is not None:
+                    persist.printf('server {} exited, restarting it'.format(self.cmd[0]))
+
+                self.start()
+
+                # close does not take the lock, so it may have missed the new process
+                if self.closed:
+                    raise util.ServerError(self.cmd)
+
+            self.expired = False
+            timer = None
+
+            if timeout is not None:
+                timer = threading.Timer(timeout, self.expire, args=(self.proc,))
+                timer.start()
+
+            try:
+                write_frame(self.proc.stdin, payload)
+                return read_frame(self.proc.stdout)
+            except (OSError, EOFError, ValueError):
+                self.stop()
+
+                if self.expired:
+                    raise util.ProcessTimeout(self.cmd, timeout)
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+                self.last_used = time.monotonic()
+
+        raise util.ServerError(self.cmd)
+
+    def expire(self, proc):
+        """Kill proc because it did not respond in time."""
+        self.expired = True
+        util.kill_process(proc)
+
+    def idle_time(self):
+        """Return the number of seconds since the server last handled a request."""
+        return time.monotonic() - self.last_used
+
+    def stop(self):
+        """
+        Stop the server process, if any. The lock must be held.
+
+        The server is asked to exit by closing its stdin,
+        and is killed if it does not exit within a second.
+
+        """
+
+        proc, self.proc = self.proc, None
+
+        if proc is None:
+            return
+
+        try:
+            proc.stdin.close()
+            proc.wait(1)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            util.kill_process(proc)
+            proc.wait()
+
+        proc.stdout.close()
+
+    def close(self):
+        """
+        Stop the server for good, it is no longer started by requests.
+
+        This does not wait for a request in progress. Its server process
+        is killed instead, and the request's thread cleans up after it.
+
+        """
+
+        self.closed = True
+
+        if self.lock.acquire(blocking=False):
+            try:
+                self.stop()
+            finally:
+                self.lock.release()
+        else:
+            proc = self.proc
+
+            if proc is not None:
+                util.kill_process(proc)
+
+
+class ServerPool:
+
+    """The running linter servers, keyed by command line and project root."""
+
+    IDLE_CHECK_INTERVAL = 10
+
+    def __init__(self):
+        # Lists of servers, keyed by command line and project root
+        self.servers = {}
+        self.lock = threading.Lock()
+        self.reaper = None
+
+    def request(self, cmd, cwd, payload, timeout=None, size=1):
+        """
+        Send payload to a server for cmd in cwd, starting it if necessary, and return the response.
+
+        A server handles one request at a time, so up to size servers are
+        started for the same cmd and cwd to handle requests concurrently.
+        The request is sent to an idle server if there is one, otherwise
+        to a new server, or once there are size servers, to the server
+        with the fewest requests.
+
+        """
+
+        key = (tuple(cmd), cwd)
+
+        with self.lock:
+            servers = self.servers.setdefault(key, [])
+            server = min(servers, key=lambda server: server.users) if servers else None
+
+            if server is None or (server.users and len(servers) < size):
+                server = Server(cmd, cwd)
+                servers.append(server)
+
+            if self.reaper is None:
+                self.reaper = threading.Thread(target=self.reap, daemon=True)
+                self.reaper.start()
+
+            # A server that is checked out is not reaped
+            server.users += 1
+
+        try:
+            return server.request(payload, timeout=timeout)
+        finally:
+            with self.lock:
+                server.users -= 1
+
+    def reap(self):
+        """Continually shut down servers that have been idle for too long."""
+
+        while True:
+            time.sleep(self.IDLE_CHECK_INTERVAL)
+            idle_timeout = persist.settings.get('server_idle_timeout', 300)
+
+            if not isinstance(idle_timeout, (int, float)) or idle_timeout <= 0:
+                continue
+
+            idle = []
+
+            with self.lock:
+                for key, servers in list(self.servers.items()):
+                    # A server that is checked out for a request is not idle. Servers
+                    # are checked out with the pool lock held, so once an idle server
+                    # is removed from the pool nobody can check it out anymore.
+                    for server in list(servers):
+                        if not server.users and server.idle_time() > idle_timeout:
+                            servers.remove(server)
+                            idle.append(server)
+
+                    if not servers:
+                        del self.servers[key]
+
+            for server in idle:
+                persist.debug('stopping idle server', repr(server.cmd))
+                server.close()
+
+    def shutdown(self):
+        """
+        Stop all of the servers.
+
+        Requests in progress or waiting for one of the servers fail with ServerError.
+
+        """
+
+        with self.lock:
+            servers = [server for key_servers in self.servers.values() for server in key_servers]
+            self.servers.clear()
+
+        for server in servers:
+            server.close()
+
+
+pool = ServerPool()
@@ -0,0 +1,145 @@
+#
+# spawn_helper.py
+# Part of SublimeLinter3, a code checking framework for Sublime Text 3
+#
+# Written by Ryan Hileman and Aparajita Fishman
+#
+# Project: https://github.com/SublimeLinter/SublimeLinter3
+# License: MIT
+#
+
+"""
+A small helper process that starts linter processes on behalf of SublimeLinter.
+
+This script is not imported by SublimeLinter, it is run by a system python 3
+(see spawner.py). Starting a process forks the parent, and the cost of a fork
+grows with the size of the parent, so processes are much cheaper to start from
+this small helper than from Sublime Text's plugin host.
+
+Messages in both directions are length-prefixed JSON objects, bytes are
+base64 encoded. Requests are handled concurrently, and each has an id that
+is included in every message about it.
+
+Requests:
+
+{"id", "argv", "env", "cwd", "stdin", "timeout"} - Start a process in a new
+    session. Once it has started, {"id", "pid"} is sent. When it finishes,
+    {"id", "stdout", "stderr", "returncode"} is sent. If it runs longer than
+    timeout seconds, its process group is killed and {"id", "timeout": true}
+    is sent. If it cannot be started, {"id", "error"} is sent.
+
+"""
+
+import base64
+import json
+import os
+import signal
+import struct
+import subprocess
+import sys
+import threading
+
+HEADER = struct.Struct('>I')
+KILL_TIMEOUT = 2
+output_lock = threading.Lock()
+
+
+def read_exactly(stream, size):
+    """Read size bytes from stream, return None if the stream ends first."""
+
+    data = b''
+
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+
+        if not chunk:
+            return None
+
+        data += chunk
+
+    return data
+
+
+def send(stream, message):
+    """Send message to SublimeLinter."""
+
+    payload = json.dumps(message).encode('utf8')
+
+    with output_lock:
+        stream.write(HEADER.pack(len(payload)) + payload)
+        stream.flush()
+
+
+def encode(data):
+    """Return bytes encoded as base64 text."""
+    return base64.b64encode(data or b'').decode('ascii')
+
+
+def spawn(request, output):
+    """Run the process described by request and send messages about it to output."""
+
+    request_id = request['id']
+    stdin = request.get('stdin')
+
+    try:
+        proc = subprocess.Popen(
+            request['argv'], stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            env=request.get('env'), cwd=request.get('cwd'), start_new_session=True)
+    except OSError as err:
+        send(output, {'id': request_id, 'error': err.strerror or str(err)})
+        return
+
+    send(output, {'id': request_id, 'pid': proc.pid})
+
+    try:
+        out, err = proc.communicate(
+            base64.b64decode(stdin) if stdin is not None else None,
+            timeout=request.get('timeout')
+        )
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+        # Processes that escaped the kill may keep the pipes open
+        try:
+            proc.communicate(timeout=KILL_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            pass
+
+        send(output, {'id': request_id, 'timeout': True})
+        return
+
+    send(output, {
+        'id': request_id,
+        'stdout': encode(out),
+        'stderr': encode(err),
+        'returncode': proc.returncode,
+    })
+
+
+def main():
+    """Handle requests until stdin is closed."""
+
+    requests = sys.stdin.buffer
+    output = sys.stdout.buffer
+
+    while True:
+        header = read_exactly(requests, HEADER.size)
+
+        if header is None:
+            break
+
+        payload = read_exactly(requests, HEADER.unpack(header)[0])
+
+        if payload is None:
+            break
+
+        request = json.loads(payload.decode('utf8'))
+        threading.Thread(target=spawn, args=(request, output), daemon=True).start()
+
+
+if __name__ == '__main__':
+    main()
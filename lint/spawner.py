@@ -0,0 +1,265 @@
+#
+# spawner.py
+# Part of SublimeLinter3, a code checking framework for Sublime Text 3
+#
+# Written by Ryan Hileman and Aparajita Fishman
+#
+# Project: https://github.com/SublimeLinter/SublimeLinter3
+# License: MIT
+#
+
+"""
+This module provides an engine that starts linter processes from a helper process.
+
+Starting a process from Sublime Text's plugin host forks the whole host, and
+the cost of that grows with the host's memory footprint. The engine instead
+sends spawn requests to spawn_helper.py, a small python 3 process that is
+started once, and which starts the linter processes from its own small
+address space and sends their output back.
+
+The engine is used by util.execute when the "subprocess_engine" setting
+is "spawner". It is only available on Posix systems, and needs a system
+python 3 to run the helper.
+
+"""
+
+import base64
+import itertools
+import json
+import os
+import subprocess
+import threading
+import time
+
+from . import persist, server, util
+
+HELPER = os.path.join(os.path.dirname(__file__), 'spawn_helper.py')
+
+
+class RemoteProcess:
+
+    """A process started by the helper, which can be killed by util.kill_process."""
+
+    def __init__(self, pid):
+        self.pid = pid
+
+
+class Request:
+
+    """A spawn request that is waiting for the helper to run its process."""
+
+    def __init__(self, token):
+        self.token = token
+        self.proc = None
+        self.result = None
+        self.done = threading.Event()
+
+    def started(self, pid):
+        """Record that the process was started and register it with the token."""
+
+        self.proc = RemoteProcess(pid)
+
+        if self.token is not None:
+            self.token.register(self.proc)
+
+    def finished(self, result):
+        """Record the final message about the request, or None if the helper exited."""
+
+        if self.token is not None and self.proc is not None:
+            self.token.unregister(self.proc)
+
+        self.result = result
+        self.done.set()
+
+
+class SpawnerEngine:
+
+    """An engine that runs processes through a helper process."""
+
+    def __init__(self, python):
+        self.python = python
+        self.proc = None
+        self.requests = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the helper and the thread that reads its messages. The lock must be held."""
+
+        self.proc = util.popen((self.python, HELPER))
+
+        if self.proc is None:
+            raise util.ProcessSpawnError((self.python, HELPER))
+
+        threading.Thread(target=self.read, args=(self.proc,), daemon=True).start()
+        threading.Thread(target=server.Server.drain, args=(self.proc,), daemon=True).start()
+        persist.debug('started spawn helper with', self.python)
+
+    def read(self, proc):
+        """Pass messages from the helper to their requests until the helper exits."""
+
+        try:
+            while True:
+                message = json.loads(server.read_frame(proc.stdout).decode('utf8'))
+
+                with self.lock:
+                    request = self.requests.get(message['id'])
+
+                    if request is not None and 'pid' not in message:
+                        del self.requests[message['id']]
+
+                if request is None:
+                    continue
+
+                if 'pid' in message:
+                    request.started(message['pid'])
+                else:
+                    request.finished(message)
+        except (OSError, EOFError, ValueError):
+            pass
+
+        # The helper exited, fail the requests it was handling
+        with self.lock:
+            if self.proc is proc:
+                self.proc = None
+
+            requests = list(self.requests.values())
+            self.requests.clear()
+
+        for request in requests:
+            request.finished(None)
+
+        try:
+            proc.wait(util.KILL_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            util.kill_process(proc)
+            proc.wait()
+
+        proc.stdout.close()
+
+    def stop(self):
+        """
+        Stop the helper, which exits once its stdin is closed.
+
+        Requests it is handling fail with ServerError, and
+        the thread that reads its messages exits.
+
+        """
+
+        with self.lock:
+            proc, self.proc = self.proc, None
+
+        if proc is None:
+            return
+
+        try:
+            proc.stdin.close()
+        except (OSError, ValueError):
+            util.kill_process(proc)
+
+    def execute(self, cmd, code=None, cwd=None, token=None, timeout=None, limits=None):
+        """
+        Run cmd through the helper and wait for its output.
+
+        The arguments, return value and exceptions are the same as util.run_process.
+
+        """
+
+        request = Request(token)
+        message = {
+            'argv': list(util.limit_cmd(cmd, limits)),
+            'env': util.popen_options()['env'],
+            'cwd': cwd,
+            'stdin': base64.b64encode(code).decode('ascii') if code is not None else None,
+            'timeout': timeout,
+        }
+
+        with self.lock:
+            if self.proc is None or self.proc.poll() is not None:
+                self.start()
+
+            message['id'] = next(self.ids)
+            self.requests[message['id']] = request
+
+            try:
+                server.write_frame(self.proc.stdin, json.dumps(message).encode('utf8'))
+            except (OSError, ValueError):
+                del self.requests[message['id']]
+                raise util.ServerError((self.python, HELPER))
+
+        # A cancelled process is killed, but processes that escaped
+        # the kill may keep its pipes open, so stop waiting after a while.
+        cancelled_at = None
+
+        while not request.done.wait(util.KILL_POLL):
+            if token is None or not token.cancelled:
+                continue
+
+            if cancelled_at is None:
+                cancelled_at = time.monotonic()
+            elif time.monotonic() - cancelled_at > util.KILL_TIMEOUT:
+                with self.lock:
+                    self.requests.pop(message['id'], None)
+
+                return b'', b''
+
+        result = request.result
+
+        if result is None:
+            raise util.ServerError((self.python, HELPER))
+        elif 'error' in result:
+            persist.debug('error launching', repr(cmd))
+            persist.debug('error was:', result['error'])
+            raise util.ProcessSpawnError(cmd)
+        elif result.get('timeout'):
+            raise util.ProcessTimeout(cmd, timeout)
+
+        out = base64.b64decode(result['stdout']), base64.b64decode(result['stderr'])
+        util.check_limits(cmd, result.get('returncode'), limits, token)
+        return out
+
+
+engine = None
+lock = threading.Lock()
+
+
+def get_engine():
+    """Return the shared engine, starting its helper if necessary, or None if it is not supported."""
+
+    global engine
+
+    if os.name != 'posix':
+        persist.debug('the spawner subprocess engine is only available on Posix systems')
+        return None
+
+    with lock:
+        if engine is None:
+            python = util.find_python(version='3')[0]
+
+            if not python:
+                persist.debug('the spawner subprocess engine requires a system python 3')
+                return None
+
+            spawner = SpawnerEngine(python)
+
+            try:
+                with spawner.lock:
+                    spawner.start()
+            except util.ProcessSpawnError:
+                return None
+
+            engine = spawner
+
+        return engine
+
+
+def shutdown():
+    """Stop the shared engine's helper, if it was started."""
+
+    global engine
+
+    with lock:
+        spawner, engine = engine, None
+
+    if spawner is not None:
+        spawner.stop()
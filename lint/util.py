@@ -11,18 +11,24 @@
 
 """This module provides general utility methods."""
 
+from collections import deque
 from functools import lru_cache
 from glob import glob
 import json
+import math
+from multiprocessing import cpu_count
 from numbers import Number
 import os
 import re
 import shutil
+import signal
 from string import Template
 import sublime
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 from xml.etree import ElementTree
 
 #
@@ -923,7 +929,584 @@ def combine_output(out, output_stream=STREAM_STDOUT, sep=''):
         ))
 
 
-def communicate(cmd, code, output_stream=STREAM_STDOUT):
+class ProcessError(Exception):
+
+    """The base class for errors raised when an external process does not complete normally."""
+
+    pass
+
+
+class ProcessCancelled(ProcessError):
+
+    """Raised when a process is terminated because its lint was cancelled."""
+
+    pass
+
+
+class ProcessTimeout(ProcessError):
+
+    """Raised when a process is killed because it ran longer than its timeout."""
+
+    pass
+
+
+class ProcessSpawnError(ProcessError):
+
+    """Raised when a process cannot be started."""
+
+    pass
+
+
+class ServerError(ProcessError):
+
+    """Raised when a linter server exits while handling a request."""
+
+    pass
+
+
+class ResourceLimitExceeded(ProcessError):
+
+    """Raised when a process is stopped by one of its resource limits. The args are cmd and the resource."""
+
+    pass
+
+
+class CancelToken:
+
+    """
+    A token that allows a lint to be cancelled while it is running.
+
+    Processes launched on behalf of a lint are registered with its token.
+    When the token is cancelled, all of the registered processes are killed,
+    along with any processes they started.
+
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self.processes = set()
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        """Mark the token as cancelled and kill its registered processes."""
+
+        with self.lock:
+            self.cancelled = True
+            processes = list(self.processes)
+
+        for proc in processes:
+            kill_process(proc)
+
+    def register(self, proc):
+        """Register a running process, killing it immediately if the token is already cancelled."""
+
+        with self.lock:
+            if not self.cancelled:
+                self.processes.add(proc)
+                return
+
+        kill_process(proc)
+
+    def unregister(self, proc):
+        """Remove a finished process from the token."""
+        with self.lock:
+            self.processes.discard(proc)
+
+
+# How often a waiting process is checked for cancellation, and how long
+# to wait for the output of a killed process before giving up on it.
+KILL_POLL = 0.25
+KILL_TIMEOUT = 2
+
+
+def kill_process(proc):
+    """
+    Kill a process started by popen, along with the processes it started.
+
+    On Posix systems, popen starts each process in its own process group,
+    so the whole group is killed. On Windows the process tree is killed
+    with taskkill, which is not waited for, since this may be called from
+    the main thread. If taskkill cannot be started, only the process is killed.
+
+    """
+
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+            return
+
+        subprocess.Popen(
+            ('taskkill', '/T', '/F', '/PID', str(proc.pid)),
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            startupinfo=popen_options()['startupinfo'])
+    except OSError:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+class Admission:
+
+    """
+    An admission controller that limits the number of linter processes running at once.
+
+    The "max_processes" setting limits the total number of processes,
+    it defaults to the number of CPUs. The "executable_limits" setting
+    maps executable names to the maximum number of processes of that
+    executable, e.g. {"javac": 1}.
+
+    Requests for a process are admitted in the order they were made,
+    but a request that is held back by its executable limit does not
+    hold back requests for other executables.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.waiting = deque()
+        self.running = 0
+        self.running_by_name = {}
+        self.waits = 0
+        self.total_wait = 0
+        self.max_wait = 0
+        self.local = threading.local()
+
+    @staticmethod
+    def get_limits():
+        """Return the global process limit and the per-executable limits from the settings."""
+
+        from . import persist
+        limit = persist.settings.get('max_processes', 0)
+
+        if not isinstance(limit, int) or limit < 1:
+            limit = cpu_count()
+
+        return limit, persist.settings.get('executable_limits') or {}
+
+    @staticmethod
+    def limited_name(cmd, limits):
+        """
+        Return the name in limits that cmd is subject to, or None.
+
+        The base names (without extension) of the first two elements of cmd
+        are checked, so scripts run by an interpreter, e.g. flake8 run by
+        @python, can be limited by the script name.
+
+        """
+
+        for arg in cmd[0:2]:
+            name = os.path.splitext(os.path.basename(str(arg)))[0]
+
+            if name in limits:
+                return name
+
+        return None
+
+    def acquire(self, cmd):
+        """
+        Wait until a process for cmd can be started.
+
+        A request object is returned. Every call must be matched with a call
+        to release with that request once the process has finished.
+
+        """
+
+        start = time.monotonic()
+
+        with self.lock:
+            limit, limits = self.get_limits()
+            request = {'name': self.limited_name(cmd, limits), 'admitted': False, 'wait': 0}
+            self.waiting.append(request)
+            self.admit(limit, limits)
+
+            while not request['admitted']:
+                self.lock.wait()
+
+            wait = request['wait'] = time.monotonic() - start
+            self.local.wait = self.thread_wait() + wait
+
+            if wait > 0.001:
+                self.waits += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+
+        if wait > 0.001:
+            from . import persist
+            persist.debug('waited {:.3f}s to run {}'.format(wait, os.path.basename(str(cmd[0]))))
+
+        return request
+
+    def thread_wait(self):
+        """Return the total time the calling thread has waited to be admitted."""
+        return getattr(self.local, 'wait', 0)
+
+    def release(self, request):
+        """Record that the process admitted by request has finished."""
+
+        with self.lock:
+            limit, limits = self.get_limits()
+            name = request['name']
+            self.running -= 1
+
+            if name is not None and self.running_by_name.get(name):
+                self.running_by_name[name] -= 1
+
+            self.admit(limit, limits)
+
+    def admit(self, limit, limits):
+        """Admit waiting requests, oldest first, while the limits allow. The lock must be held."""
+
+        admitted = False
+
+        for request in list(self.waiting):
+            if self.running >= limit:
+                break
+
+            name = request['name']
+
+            if name is not None and self.running_by_name.get(name, 0) >= limits.get(name, limit):
+                continue
+
+            self.waiting.remove(request)
+            self.running += 1
+
+            if name is not None:
+                self.running_by_name[name] = self.running_by_name.get(name, 0) + 1
+
+            request['admitted'] = True
+            admitted = True
+
+        if admitted:
+            self.lock.notify_all()
+
+    def metrics(self):
+        """Return a dict with the number of waiting and running processes and wait time statistics."""
+
+        with self.lock:
+            return {
+                'waiting': len(self.waiting),
+                'running': self.running,
+                'waits': self.waits,
+                'total_wait': self.total_wait,
+                'max_wait': self.max_wait,
+            }
+
+
+admission = Admission()
+
+
+class CircuitBreaker:
+
+    """
+    A circuit breaker that stops running a linter that keeps failing.
+
+    While the linter works the breaker is closed. After "breaker_threshold"
+    consecutive failures the breaker opens, and the linter is skipped for
+    a backoff period that starts at "breaker_backoff" seconds and doubles
+    each time the breaker opens again, up to BACKOFF_MAX seconds.
+
+    Once the backoff period has passed the breaker is half open and the linter
+    is run again as a probe. If the probe succeeds the breaker closes, if it
+    fails the breaker opens again right away.
+
+    The breaker also counts all failures by reason, e.g. how often
+    the linter timed out, for the status command.
+
+    """
+
+    BACKOFF_MAX = 300
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.trips = 0
+        self.open_until = None
+        self.reason = None
+        self.totals = {}
+
+    @staticmethod
+    def get_limits():
+        """Return the failure threshold and the initial backoff from the settings, or None if disabled."""
+
+        from . import persist
+        threshold = persist.settings.get('breaker_threshold', 3)
+        backoff = persist.settings.get('breaker_backoff', 5)
+
+        if not isinstance(threshold, int) or threshold < 1:
+            return None
+
+        if not isinstance(backoff, (int, float)) or backoff <= 0:
+            backoff = 5
+
+        return threshold, backoff
+
+    def allow(self):
+        """Return True if the breaker is closed or half open."""
+
+        with self.lock:
+            return self.open_until is None or time.monotonic() >= self.open_until
+
+    def succeeded(self):
+        """Record a success and close the breaker. Return True if the breaker was not closed."""
+
+        with self.lock:
+            tripped = self.open_until is not None
+            self.failures = self.trips = 0
+            self.open_until = self.reason = None
+            return tripped
+
+    def failed(self, reason):
+        """
+        Record a failure, reason describes what went wrong.
+
+        If the breaker opens, the number of seconds it will stay open is returned.
+        Otherwise None is returned.
+
+        """
+
+        limits = self.get_limits()
+
+        with self.lock:
+            self.failures += 1
+            self.reason = reason
+            self.totals[reason] = self.totals.get(reason, 0) + 1
+
+            if limits is None:
+                return None
+
+            threshold, backoff = limits
+
+            # A failure while half open reopens the breaker immediately
+            if self.open_until is None and self.failures < threshold:
+                return None
+
+            self.trips += 1
+            backoff = min(backoff * 2 ** (self.trips - 1), self.BACKOFF_MAX)
+            self.open_until = time.monotonic() + backoff
+            return backoff
+
+    def state(self):
+        """Return a dict with the breaker's state ("closed", "open" or "half open") and failure info."""
+
+        with self.lock:
+            if self.open_until is None:
+                state, remaining = 'closed', 0
+            else:
+                remaining = max(0, self.open_until - time.monotonic())
+                state = 'open' if remaining else 'half open'
+
+            return {
+                'state': state,
+                'failures': self.failures,
+                'trips': self.trips,
+                'remaining': remaining,
+                'reason': self.reason,
+                'totals': dict(self.totals),
+            }
+
+
+def execute(cmd, code=None, cwd=None, token=None, timeout=None, limits=None):
+    """
+    Run cmd, send code (if any) to its stdin, and return its output.
+
+    The output is a tuple of stdout and stderr as bytes, suitable for passing
+    to combine_output. If the executable cannot be launched, ProcessSpawnError
+    is raised.
+
+    If token is not None, the process is registered with it. If the token
+    is cancelled before or while the process runs, ProcessCancelled is raised.
+
+    If timeout is not None and the process runs longer than timeout seconds,
+    the process (and on Posix systems its process group) is killed
+    and ProcessTimeout is raised.
+
+    If limits is not empty, the process is started with those resource limits
+    and scheduling priority (see limit_cmd), and ResourceLimitExceeded
+    is raised if it is stopped by one of the limits.
+
+    The process is not started until the admission controller allows it.
+
+    """
+
+    if token is not None and token.cancelled:
+        raise ProcessCancelled(cmd)
+
+    request = admission.acquire(cmd)
+
+    try:
+        if token is not None and token.cancelled:
+            raise ProcessCancelled(cmd)
+
+        engine = get_engine()
+
+        if engine is None:
+            out = run_process(cmd, code, cwd=cwd, token=token, timeout=timeout, limits=limits)
+        else:
+            out = engine.execute(cmd, code, cwd=cwd, token=token, timeout=timeout, limits=limits)
+    finally:
+        admission.release(request)
+
+    if token is not None and token.cancelled:
+        raise ProcessCancelled(cmd)
+
+    return out
+
+
+def run_process(cmd, code=None, cwd=None, token=None, timeout=None, limits=None):
+    """Run cmd with popen on the calling thread, as described in execute, and return its output."""
+
+    proc = popen(cmd, cwd=cwd, limits=limits)
+
+    if proc is None:
+        raise ProcessSpawnError(cmd)
+
+    if token is not None:
+        token.register(proc)
+
+    try:
+        out = wait_process(proc, code, token, timeout)
+    finally:
+        if token is not None:
+            token.unregister(proc)
+
+    if out is None:
+        raise ProcessTimeout(cmd, timeout)
+
+    check_limits(cmd, proc.returncode, limits, token)
+    return out
+
+
+def wait_process(proc, code, token=None, timeout=None):
+    """
+    Send code to proc and return its stdout and stderr as bytes.
+
+    If the process runs longer than timeout seconds, it is killed and None
+    is returned. If token is cancelled, empty output is returned once the
+    process has been killed. Output is only waited for KILL_TIMEOUT seconds
+    after a kill, since processes that escaped the kill may keep the pipes open.
+
+    """
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    while True:
+        wait = KILL_POLL
+
+        if deadline is not None:
+            wait = max(0, min(wait, deadline - time.monotonic()))
+
+        try:
+            return proc.communicate(code, timeout=wait)
+        except subprocess.TimeoutExpired:
+            # The input has been sent, it must not be sent again
+            code = None
+
+        if token is not None and token.cancelled:
+            kill_process(proc)
+            reap_process(proc)
+            return b'', b''
+
+        if deadline is not None and time.monotonic() >= deadline:
+            kill_process(proc)
+            reap_process(proc)
+            return None
+
+
+def reap_process(proc):
+    """Wait up to KILL_TIMEOUT seconds for a killed process to finish, then close its pipes."""
+
+    try:
+        proc.communicate(timeout=KILL_TIMEOUT)
+        return
+    except (subprocess.TimeoutExpired, ValueError, OSError):
+        pass
+
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+    for stream in (proc.stdin, proc.stdout, proc.stderr):
+        try:
+            if stream is not None:
+                stream.close()
+        except OSError:
+            pass
+
+
+# Signals that end a process which ran out of memory, as return codes
+MEMORY_SIGNALS = tuple(
+    -getattr(signal, name) for name in ('SIGABRT', 'SIGSEGV', 'SIGBUS') if hasattr(signal, name)
+)
+
+
+def check_limits(cmd, returncode, limits, token=None):
+    """
+    Raise ResourceLimitExceeded if a process that ran with limits was stopped by one of them.
+
+    This is judged by the signal that ended the process, never by its output,
+    since linters exit with an error whenever they find errors, and echo
+    source lines that may contain anything. A process that uses up its
+    CPU time is sent SIGXCPU, then SIGKILL a second later. A process that
+    runs out of address space cannot allocate memory, which often ends in
+    an abort or a segmentation fault. If there is no CPU time limit, SIGKILL
+    is also taken to be the out of memory killer.
+
+    If token was cancelled, the process was killed by the token and nothing
+    is raised. If the shell that applied the limits could not execute cmd,
+    ProcessSpawnError is raised.
+
+    """
+
+    if not limits or os.name != 'posix' or not returncode:
+        return
+
+    if token is not None and token.cancelled:
+        return
+
+    if returncode == 127 and limit_cmd(cmd, limits) is not cmd:
+        raise ProcessSpawnError(cmd)
+
+    if limits.get('cpu_time') and returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        raise ResourceLimitExceeded(cmd, 'cpu time')
+
+    if limits.get('memory') and (
+        returncode in MEMORY_SIGNALS or
+        (returncode == -signal.SIGKILL and not limits.get('cpu_time'))
+    ):
+        raise ResourceLimitExceeded(cmd, 'memory')
+
+
+def get_engine():
+    """
+    Return the subprocess engine selected by the "subprocess_engine" setting.
+
+    If the setting is "asyncio" and the asyncio engine can be used with the
+    running python, or the setting is "spawner" and the spawner engine can be
+    used on this system, the engine is returned. Otherwise None is returned,
+    and processes are run on the calling thread.
+
+    """
+
+    from . import persist
+    name = persist.settings.get('subprocess_engine')
+
+    if name == 'spawner':
+        from . import spawner
+        return spawner.get_engine()
+    elif name != 'asyncio':
+        return None
+
+    try:
+        from . import engine
+    except (ImportError, SyntaxError):
+        return None
+
+    return engine.get_engine()
+
+
+def communicate(cmd, code, output_stream=STREAM_STDOUT, token=None, timeout=None, limits=None):
     """
     Return the result of sending code via stdin to an executable.
 
@@ -931,17 +1514,15 @@ def communicate(cmd, code, output_stream=STREAM_STDOUT):
 
     """
 
-    out = popen(cmd)
+    out = execute(cmd, code.encode('utf8'), token=token, timeout=timeout, limits=limits)
 
     if out is not None:
-        code = code.encode('utf8')
-        out = out.communicate(code)
         return combine_output(out, output_stream=output_stream)
     else:
         return ''
 
 
-def tmpfile(cmd, code, suffix='', output_stream=STREAM_STDOUT):
+def tmpfile(cmd, code, suffix='', output_stream=STREAM_STDOUT, token=None, timeout=None, limits=None):
     """
     Return the result of running an executable against a temporary file containing code.
 
@@ -960,16 +1541,15 @@ def tmpfile(cmd, code, suffix='', output_stream=STREAM_STDOUT):
         f.flush()
 
         cmd = cmd + (f.name,)
-        out = popen(cmd)
+        out = execute(cmd, token=token, timeout=timeout, limits=limits)
 
         if out:
-            out = out.communicate()
             return combine_output(out, output_stream)
         else:
             return ''
 
 
-def tmpdir(cmd, files, filename, code, output_stream=STREAM_STDOUT):
+def tmpdir(cmd, files, filename, code, output_stream=STREAM_STDOUT, token=None, timeout=None, limits=None):
     """
     Run an executable against a temporary file containing code.
 
@@ -1005,11 +1585,9 @@ def tmpdir(cmd, files, filename, code, output_stream=STREAM_STDOUT):
             else:
                 shutil.copyfile(f, target)
 
-        os.chdir(d)
-        out = popen(cmd)
+        out = execute(cmd, cwd=d, token=token, timeout=timeout, limits=limits)
 
         if out:
-            out = out.communicate()
             out = combine_output(out, sep='\n', output_stream=output_stream)
 
             # filter results from build to just this filename
@@ -1026,8 +1604,102 @@ def tmpdir(cmd, files, filename, code, output_stream=STREAM_STDOUT):
     return out or ''
 
 
-def popen(cmd, env=None):
-    """Open a pipe to an external process and return a Popen object."""
+def tmpfiles(cmd, files, output_stream=STREAM_STDOUT, token=None, timeout=None, limits=None):
+    """
+    Run an executable once against temporary files and return its output split by file.
+
+    files is a list of (filename, code) tuples. Each code is written to its own
+    directory in a temporary directory under the basename of filename, and the
+    paths are appended to cmd. The result is a list with the part of the output
+    about each file, in the same order as files (see split_output). If there is
+    output but it mentions none of the paths, e.g. because cmd rejected them,
+    None is returned.
+
+    """
+
+    d = os.path.realpath(tempfile.mkdtemp())
+
+    try:
+        paths = []
+
+        for i, (filename, code) in enumerate(files):
+            path = os.path.join(d, str(i), os.path.basename(filename))
+            os.mkdir(os.path.dirname(path))
+
+            if isinstance(code, str):
+                code = code.encode('utf8')
+
+            with open(path, 'wb') as f:
+                f.write(code)
+
+            paths.append(path)
+
+        out = execute(tuple(cmd) + tuple(paths), token=token, timeout=timeout, limits=limits)
+        out = combine_output(out, sep='\n', output_stream=output_stream) if out else ''
+    finally:
+        shutil.rmtree(d, True)
+
+    outputs = split_output(out, paths)
+
+    if out.strip() and not any(outputs):
+        return None
+
+    return outputs
+
+
+def split_output(output, paths):
+    """
+    Split the output of a linter run on several files and return a list with the output about each path.
+
+    A line belongs to the path it mentions. Lines that mention no path,
+    such as the lines of a multiline message or the errors under a file
+    heading, belong to the last path mentioned. Lines before the first
+    path is mentioned are dropped.
+
+    """
+
+    lines = [[] for path in paths]
+    current = None
+
+    for line in output.splitlines():
+        for i, path in enumerate(paths):
+            if path in line:
+                current = i
+                break
+
+        if current is not None:
+            lines[current].append(line)
+
+    return ['\n'.join(file_lines) for file_lines in lines]
+
+
+def popen(cmd, env=None, cwd=None, limits=None):
+    """
+    Open a pipe to an external process and return a Popen object.
+
+    If cwd is not None, the process is started in that directory. Lints run
+    concurrently, so this must be used instead of changing our own directory.
+
+    On Posix systems the process is started in a new session, so that it
+    and any processes it starts can be killed as a group by kill_process,
+    and with the resource limits and scheduling priority in limits, if any
+    (see limit_cmd).
+
+    """
+
+    options = popen_options(env)
+
+    try:
+        return subprocess.Popen(
+            limit_cmd(cmd, limits), stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=cwd, **options)
+    except OSError as err:
+        popen_failed(cmd, err, options['env'])
+
+
+def popen_options(env=None):
+    """Return the platform-specific keyword arguments used to start processes."""
 
     info = None
 
@@ -1039,16 +1711,68 @@ def popen(cmd, env=None):
     if env is None:
         env = create_environment()
 
-    try:
-        return subprocess.Popen(
-            cmd, stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            startupinfo=info, env=env)
-    except OSError as err:
-        from . import persist
-        persist.debug('error launching', repr(cmd))
-        persist.debug('error was:', err.strerror)
-        persist.debug('environment:', env)
+    return {'startupinfo': info, 'env': env, 'start_new_session': os.name == 'posix'}
+
+
+def limit_cmd(cmd, limits):
+    """
+    Return cmd wrapped so that it runs with limits, or cmd if there is nothing to apply.
+
+    limits is a dict as returned by Linter.get_limits, with any of the keys
+    "memory" (address space in megabytes), "cpu_time" (in seconds), "nice"
+    and "io_priority" (a best-effort level from 0 to 7, or "idle").
+
+    Processes are started from many threads, where preexec_fn is not safe,
+    so the limits are applied by a shell that sets them with ulimit and then
+    executes cmd, through nice and ionice if necessary. Limits that cannot be
+    applied are skipped. Limits are only supported on Posix systems,
+    and io_priority only on Linux.
+
+    """
+
+    if not limits or os.name != 'posix':
+        return cmd
+
+    script = []
+    memory = limits.get('memory')
+    cpu_time = limits.get('cpu_time')
+
+    if memory:
+        script.append('ulimit -v {}'.format(int(memory * 1024)))
+
+    if cpu_time:
+        # SIGXCPU at the soft limit, SIGKILL at the hard limit if it is ignored.
+        # The soft limit goes first, a hard limit below it is rejected.
+        seconds = int(math.ceil(cpu_time))
+        script.append('ulimit -S -t {}'.format(seconds))
+        script.append('ulimit -H -t {}'.format(seconds + 1))
+
+    prefix = []
+
+    if limits.get('nice'):
+        prefix += ['nice', '-n', str(limits['nice'])]
+
+    io_priority = limits.get('io_priority')
+
+    if io_priority is not None and sys.platform.startswith('linux') and find_executable('ionice'):
+        if io_priority == 'idle':
+            prefix += ['ionice', '-t', '-c', '3']
+        else:
+            prefix += ['ionice', '-t', '-c', '2', '-n', str(io_priority)]
+
+    if not script and not prefix:
+        return cmd
+
+    script = ''.join('{} 2>/dev/null; '.format(command) for command in script) + 'exec "$@"'
+    return ('/bin/sh', '-c', script, 'sh') + tuple(prefix) + tuple(cmd)
+
+
+def popen_failed(cmd, err, env):
+    """Report a failure to launch cmd."""
+    from . import persist
+    persist.debug('error launching', repr(cmd))
+    persist.debug('error was:', err.strerror)
+    persist.debug('environment:', env)
 
 
 # view utils
@@ -30,4 +30,10 @@ class __class__(__superclass__):
     defaults = {}
     inline_settings = None
     inline_overrides = None
+    cost = 'medium'
+    parallel_safe = True
+    multiple_files = False
+    server_mode = False
+    server_cmd = None
+    line_local = False
     __extra_attributes__
\ No newline at end of file
@@ -12,14 +12,15 @@
 
 import os
 import re
+import threading
 
 import sublime
 import sublime_plugin
 
 from .lint.linter import Linter
 from .lint.highlight import HighlightSet
-from .lint.queue import queue
-from .lint import persist, util
+from .lint.queue import queue, PRIORITY_ACTIVE, PRIORITY_HIDDEN, PRIORITY_SAVE, PRIORITY_VISIBLE
+from .lint import persist, server, spawner, util
 
 
 def plugin_loaded():
@@ -32,6 +33,9 @@ def plugin_loaded():
     util.generate_color_scheme(from_reload=False)
     util.install_syntaxes()
 
+    # Start the subprocess engine now, so the first lint does not wait for it
+    util.get_engine()
+
     persist.settings.on_update_call(SublimeLinter.on_settings_updated)
 
     # This ensures we lint the active view on a fresh install
@@ -41,6 +45,12 @@ def plugin_loaded():
         SublimeLinter.shared_plugin().on_activated(window.active_view())
 
 
+def plugin_unloaded():
+    """The ST3 exit point for plugins."""
+    server.pool.shutdown()
+    spawner.shutdown()
+
+
 class SublimeLinter(sublime_plugin.EventListener):
 
     """The main ST3 plugin class."""
@@ -72,20 +82,75 @@ class SublimeLinter(sublime_plugin.EventListener):
         # marks are not updated because their positions may no longer be valid.
         self.last_hit_times = {}
 
+        # A mapping between view ids and the ids of their buffers. Views that
+        # show the same buffer are clones, and their lints are run once,
+        # in the clone with the lowest view id, see get_primary.
+        self.buffer_ids = {}
+
+        # A mapping between view ids and the ids of their primary clones
+        self.primary_ids = {}
+
+        # The ids of views whose syntax setting is observed, see watch_syntax
+        self.watched_views = set()
+
         self.__class__.shared_instance = self
         queue.start(self.lint)
 
     @classmethod
     def lint_all_views(cls):
-        """Simulate a modification of all views, which will trigger a relint."""
+        """
+        Simulate a modification of all views, which will trigger a relint.
+
+        So that we do not launch linters for every view at once, the lints
+        are staggered in priority order, at the rate given by the "relint_rate"
+        setting (views per second). Hidden views come last, and are only
+        linted when no other view is being linted.
+
+        If the "batch_relint" setting is on, linters that accept several files
+        per invocation are first run once for all of the views they are assigned
+        to on a background thread, and the lints of those views then use the
+        output of those runs. Other views are relinted right away.
+
+        """
+
+        views = {}
 
         def apply(view):
             if view.id() in persist.view_linters:
-                cls.shared_instance.hit(view)
+                view = cls.shared_instance.get_primary(view)
+                views[view.id()] = view
 
         util.apply_to_all_views(apply)
+        views = sorted(views.values(), key=lambda view: queue.get_priority(view.id()))
+
+        rate = persist.settings.get('relint_rate', 0)
+        interval = 1 / rate if isinstance(rate, (int, float)) and rate > 0 else 0
 
-    def lint(self, view_id, hit_time=None, callback=None):
+        def relint(views):
+            for i, view in enumerate(views):
+                cls.shared_instance.hit(view, delay=i * interval)
+
+        batched = []
+
+        if persist.settings.get('batch_relint'):
+            batched = [view for view in views if Linter.get_batch_linters(view.id())]
+
+        if len(batched) < 2:
+            relint(views)
+            return
+
+        batched_ids = set(view.id() for view in batched)
+        relint([view for view in views if view.id() not in batched_ids])
+
+        def batch():
+            try:
+                Linter.lint_batches(batched)
+            finally:
+                sublime.set_timeout(lambda: relint(batched), 0)
+
+        threading.Thread(target=batch, daemon=True).start()
+
+    def lint(self, view_id, hit_time=None, callback=None, token=None, background=False):
         """
         Lint the view with the given id.
 
@@ -100,17 +165,26 @@ class SublimeLinter(sublime_plugin.EventListener):
         callback is the method to call when the lint is finished. If not
         provided, it defaults to highlight().
 
+        If provided, token is a util.CancelToken the queue uses to abort
+        the lint when the view is modified again before the lint finishes.
+
+        background is True if the lint was triggered by typing in background
+        lint mode, in which case linters that are too slow are skipped.
+
+        True is returned if the lint ran to completion and the view was
+        not modified in the meantime, so its results are current.
+
         """
 
         # If the view has been modified since the lint was triggered,
         # don't lint again.
         if hit_time is not None and self.last_hit_times.get(view_id, 0) > hit_time:
-            return
+            return False
 
         view = Linter.get_view(view_id)
 
         if view is None:
-            return
+            return False
 
         # Build a list of regions that match the linter's selectors
         sections = {}
@@ -124,7 +198,12 @@ class SublimeLinter(sublime_plugin.EventListener):
         filename = view.file_name()
         code = Linter.text(view)
         callback = callback or self.highlight
-        Linter.lint_view(view_id, filename, code, sections, hit_time, callback)
+        completed = Linter.lint_view(
+            view_id, filename, code, sections, hit_time, callback,
+            token=token, background=background
+        )
+
+        return bool(completed) and (hit_time is None or self.last_hit_times.get(view_id, 0) <= hit_time)
 
     def highlight(self, view, linters, hit_time):
         """
@@ -138,7 +217,7 @@ class SublimeLinter(sublime_plugin.EventListener):
 
         If the view has not been modified since hit_time, all of the marks and
         errors from the list of linters are aggregated and drawn, and the status
-        is updated.
+        is updated, in view and all of its clones.
 
         """
 
@@ -150,7 +229,7 @@ class SublimeLinter(sublime_plugin.EventListener):
             return
 
         errors = {}
-        highlights = persist.highlights[vid] = HighlightSet()
+        highlights = HighlightSet()
 
         for linter in linters:
             if linter.highlight:
@@ -160,27 +239,86 @@ class SublimeLinter(sublime_plugin.EventListener):
                 for line, errs in linter.errors.items():
                     errors.setdefault(line, []).extend(errs)
 
-        highlights.clear(view)
-        highlights.draw(view)
-        persist.errors[vid] = errors
+        for clone_id in self.get_clones(view):
+            clone = Linter.get_view(clone_id)
 
-        # Update the status
-        self.on_selection_modified_async(view)
+            if clone is None:
+                continue
 
-    def hit(self, view):
-        """Record an activity that could trigger a lint and enqueue a desire to lint."""
+            highlights.clear(clone)
+            highlights.draw(clone)
+            persist.highlights[clone_id] = highlights
+            persist.errors[clone_id] = errors
 
-        vid = view.id()
-        self.check_syntax(view)
-        self.linted_views.add(vid)
+            # Update the status
+            self.on_selection_modified_async(clone)
+
+    def hit(self, view, delay=None, priority=None, callback=None, background=False):
+        """
+        Record an activity that could trigger a lint and enqueue a desire to lint.
+
+        If delay is not None, the lint is due after that many seconds
+        instead of the normal delay. priority, callback and background
+        are passed on to the queue, see Daemon.hit.
+
+        If view has clones, the lint is requested for the primary clone.
+
+        A background hit comes from a keystroke, so it must be cheap: the syntax
+        is not checked, since changes to it are observed by watch_syntax.
+
+        """
+
+        if not background:
+            self.check_syntax(view)
+
+        self.linted_views.add(view.id())
 
         if view.size() == 0:
-            for linter in Linter.get_linters(vid):
-                linter.clear()
+            for vid in self.get_clones(view):
+                for linter in Linter.get_linters(vid):
+                    linter.clear()
 
             return
 
-        self.last_hit_times[vid] = queue.hit(view)
+        view = self.get_primary(view)
+        vid = view.id()
+        self.last_hit_times[vid] = queue.hit(
+            view, delay=delay, priority=priority, callback=callback, background=background
+        )
+
+    def get_buffer_id(self, view):
+        """Return the id of the buffer view shows, which never changes for a view."""
+
+        vid = view.id()
+
+        if vid not in self.buffer_ids:
+            self.buffer_ids[vid] = view.buffer_id()
+            self.primary_ids.clear()
+
+        return self.buffer_ids[vid]
+
+    def get_clones(self, view):
+        """Return the ids of the views that show the same buffer as view, including view, lowest first."""
+        buffer_id = self.get_buffer_id(view)
+        return sorted(clone for clone, clone_buffer in self.buffer_ids.items() if clone_buffer == buffer_id)
+
+    def get_primary(self, view):
+        """Return the clone of view with linters that has the lowest id, or view if there is none."""
+
+        vid = view.id()
+        primary_id = self.primary_ids.get(vid)
+
+        if primary_id not in persist.view_linters:
+            primary_id = vid
+
+            for clone_id in self.get_clones(view):
+                if clone_id in persist.view_linters:
+                    primary_id = clone_id
+                    break
+
+            self.primary_ids[vid] = primary_id
+
+        return Linter.get_view(primary_id) or view
 
     def check_syntax(self, view):
         """
@@ -192,16 +330,42 @@ class SublimeLinter(sublime_plugin.EventListener):
 
         vid = view.id()
         syntax = persist.get_syntax(view)
+        self.watch_syntax(view)
 
         # Syntax either has never been set or just changed
         if not vid in self.view_syntax or self.view_syntax[vid] != syntax:
             self.view_syntax[vid] = syntax
             Linter.assign(view, reset=True)
+            self.primary_ids.clear()
+            queue.update_delay(view)
             self.clear(view)
             return True
         else:
             return False
 
+    def watch_syntax(self, view):
+        """
+        Check the syntax of view whenever its settings change.
+
+        The syntax is a view setting, so this catches syntax changes
+        without checking the syntax on every keystroke.
+
+        """
+
+        vid = view.id()
+
+        if vid in self.watched_views:
+            return
+
+        def on_change():
+            if self.check_syntax(view):
+                self.hit(view)
+
+        self.watched_views.add(vid)
+        settings = view.settings()
+        settings.clear_on_change('sublimelinter-syntax')
+        settings.add_on_change('sublimelinter-syntax', on_change)
+
     def clear(self, view):
         """Clear all marks, errors and status from the given view."""
         Linter.clear_view(view)
@@ -209,28 +373,79 @@ class SublimeLinter(sublime_plugin.EventListener):
     # sublime_plugin.EventListener event handlers
 
     def on_modified(self, view):
-        """Called when a view is modified."""
+        """
+        Called when a view is modified.
 
-        if view.id() not in persist.view_linters:
-            syntax_changed = self.check_syntax(view)
+        This is called on every keystroke, so it does no more than request
+        a lint. Syntax changes are observed by watch_syntax, and the delay
+        is cached by the queue.
 
-            if not syntax_changed:
-                return
-        else:
-            syntax_changed = False
+        """
+
+        if view.id() not in persist.view_linters:
+            return
 
-        if syntax_changed or persist.settings.get('lint_mode') == 'background':
-            self.hit(view)
+        if persist.settings.get('lint_mode') == 'background':
+            self.hit(view, background=True)
         else:
             self.clear(view)
 
+    def update_priorities(self, active_view=None):
+        """
+        Update the lint priorities of all views.
+
+        active_view, or if not given the active view of the active window,
+        gets the highest priority. Views that are visible in the groups of
+        any window come next, and all other views are hidden.
+
+        """
+
+        priorities = {}
+
+        for window in sublime.windows():
+            for view in window.views():
+                priorities[view.id()] = PRIORITY_HIDDEN
+                self.get_buffer_id(view)
+
+            for group in range(window.num_groups()):
+                view = window.active_view_in_group(group)
+
+                if view:
+                    priorities[view.id()] = PRIORITY_VISIBLE
+
+        if active_view is None:
+            window = sublime.active_window()
+            active_view = window.active_view() if window else None
+
+        if active_view:
+            priorities[active_view.id()] = PRIORITY_ACTIVE
+
+        # Clones are linted in their primary clone, which must have
+        # the highest priority of any of them.
+        buffer_priorities = {}
+
+        for vid, priority in priorities.items():
+            buffer_id = self.buffer_ids.get(vid)
+
+            if buffer_id is not None:
+                buffer_priorities[buffer_id] = min(priority, buffer_priorities.get(buffer_id, priority))
+
+        for vid in priorities:
+            priorities[vid] = buffer_priorities.get(self.buffer_ids.get(vid), priorities[vid])
+
+        queue.set_priorities(priorities)
+
     def on_activated(self, view):
         """Called when a view gains input focus."""
 
         # Reload the plugin settings.
         persist.settings.load()
+        self.update_priorities(view)
+
+        if not self.check_syntax(view):
+            # The .sublimelinterrc files may have changed while the view was inactive
+            queue.update_delay(view)
 
-        self.check_syntax(view)
         view_id = view.id()
 
         if not view_id in self.linted_views:
@@ -242,6 +457,10 @@ class SublimeLinter(sublime_plugin.EventListener):
 
         self.on_selection_modified_async(view)
 
+    def on_deactivated(self, view):
+        """Called when a view loses input focus."""
+        self.update_priorities()
+
     def on_open_settings(self, view):
         """
         Called when any settings file is opened.
@@ -272,6 +491,8 @@ class SublimeLinter(sublime_plugin.EventListener):
     @classmethod
     def on_settings_updated(cls, relint=False):
         """Callback triggered when the settings are updated."""
+        queue.clear_delays()
+
         if relint:
             cls.lint_all_views()
         else:
@@ -283,6 +504,7 @@ class SublimeLinter(sublime_plugin.EventListener):
         vid = view.id()
         self.loaded_views.add(vid)
         self.view_syntax[vid] = persist.get_syntax(view)
+        self.watch_syntax(view)
 
     def on_selection_modified_async(self, view):
         """Called when the selection changes (cursor moves or text selected)."""
@@ -346,6 +568,7 @@ class SublimeLinter(sublime_plugin.EventListener):
 
         # First check to see if the project settings changed
         if view.window().project_file_name() == view.file_name():
+            queue.clear_delays()
             self.lint_all_views()
         else:
             # Now see if a .sublimelinterrc has changed
@@ -358,6 +581,7 @@ class SublimeLinter(sublime_plugin.EventListener):
                 if view.file_name() == rc_path:
                     persist.settings.load(force=True)
                 else:
+                    queue.clear_delays()
                     self.lint_all_views()
 
             # If a file other than one of our settings files changed,
@@ -367,25 +591,50 @@ class SublimeLinter(sublime_plugin.EventListener):
                 vid = view.id()
                 mode = persist.settings.get('lint_mode')
                 show_errors = persist.settings.get('show_errors_on_save')
+                lint = False
 
                 if syntax_changed:
                     self.clear(view)
 
                     if vid in persist.view_linters:
                         if mode != 'manual':
-                            self.lint(vid)
+                            lint = True
                         else:
                             show_errors = False
                     else:
                         show_errors = False
                 else:
                     if show_errors or mode in ('load/save', 'save only'):
-                        self.lint(vid)
+                        lint = True
                     elif mode == 'manual':
                         show_errors = False
+                    elif mode == 'background':
+                        # Linters that are too slow for background mode
+                        # still run when the view is saved.
+                        size = view.size()
+                        lint = any(
+                            linter.is_slow(size)
+                            for linter in persist.view_linters.get(vid, ())
+                        )
+
+                # Lint in the background so the save does not block the UI,
+                # but ahead of any other lint.
+                if lint:
+                    if show_errors:
+                        def callback(view_id):
+                            sublime.set_timeout(lambda: self.show_errors(view), 0)
+                    else:
+                        callback = None
 
-                if show_errors and vid in persist.errors and persist.errors[vid]:
-                    view.run_command('sublimelinter_show_all_errors')
+                    self.hit(view, delay=0, priority=PRIORITY_SAVE, callback=callback)
+
+    def show_errors(self, view):
+        """Show a quick panel with all of the errors in view, if it has any."""
+
+        vid = view.id()
+
+        if vid in persist.errors and persist.errors[vid]:
+            view.run_command('sublimelinter_show_all_errors')
 
     def on_close(self, view):
         """Called after view is closed."""
@@ -404,6 +653,13 @@ class SublimeLinter(sublime_plugin.EventListener):
         if vid in self.last_hit_times:
             del self.last_hit_times[vid]
 
+        if vid in self.buffer_ids:
+            del self.buffer_ids[vid]
+            self.primary_ids.clear()
+
+        self.watched_views.discard(vid)
+
+        queue.forget(vid)
         persist.view_did_close(vid)
 
 
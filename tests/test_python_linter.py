@@ -0,0 +1,109 @@
+#
+# test_python_linter.py
+# Part of SublimeLinter3, a code checking framework for Sublime Text 3
+#
+# Project: https://github.com/SublimeLinter/SublimeLinter3
+# License: MIT
+#
+
+"""
+Tests for PythonLinter.
+
+These tests run inside Sublime Text with the UnitTesting package.
+
+"""
+
+import os
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+import sublime
+
+from SublimeLinter.lint import linter, persist, server, util
+
+
+class Checker(linter.PythonLinter):
+
+    """A module linter whose builtin check can be told apart from its script."""
+
+    name = 'checker'
+    cmd = 'checker@python'
+    module = 'json'
+
+    def check(self, code, filename):
+        return 'builtin'
+
+
+class TestIsolateBuiltinChecks(TestCase):
+
+    """Tests for the "isolate_builtin_checks" setting."""
+
+    def setUp(self):
+        self.view = sublime.active_window().new_file()
+        self.settings = persist.settings.settings.copy()
+
+        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+            f.write('import sys\nprint("worker", len(sys.stdin.read()))\n')
+            self.script = f.name
+
+        python = util.find_python(version='3')[0]
+
+        if not python:
+            self.skipTest('a system python 3 is required')
+
+        def find_python(version=None, script=None, module=None):
+            return python, self.script, 3, None
+
+        patcher = patch.object(util, 'find_python', find_python)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.linter = Checker(self.view, 'python', 'test.py')
+        self.linter.reset('abc', 'test.py')
+
+    def tearDown(self):
+        persist.settings.settings = self.settings
+        self.view.set_scratch(True)
+        self.view.close()
+        os.remove(self.script)
+
+    def test_builtin_check_runs_in_plugin_host_by_default(self):
+        persist.settings.settings['isolate_builtin_checks'] = False
+        self.assertEqual(self.linter.run(None, 'abc'), 'builtin')
+
+    def test_builtin_check_runs_out_of_process(self):
+        persist.settings.settings['isolate_builtin_checks'] = True
+        self.assertEqual(self.linter.get_worker_cmd()[1], self.script)
+
+        with patch.object(Checker, 'check') as check:
+            output = self.linter.run(None, 'abc')
+
+        self.assertFalse(check.called)
+        self.assertEqual(output.strip(), 'worker 3')
+
+    def test_builtin_checks_run_in_a_pool_of_workers(self):
+        persist.settings.settings['isolate_builtin_checks'] = True
+        persist.settings.settings['lint_workers'] = 2
+        self.addCleanup(server.pool.shutdown)
+
+        with open(self.script, 'w') as f:
+            f.write('import os, time\ntime.sleep(1)\nprint(os.getpid())\n')
+
+        linters = [self.linter, Checker(self.view, 'python', 'other.py')]
+        linters[1].reset('def', 'other.py')
+        outputs = []
+
+        def run(linter):
+            outputs.append(linter.run(None, linter.code).strip())
+
+        threads = [threading.Thread(target=run, args=(linter,)) for linter in linters]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(outputs)), 2)